@@ -0,0 +1,80 @@
+"""Raw page snapshots and the offline replay benchmark."""
+import os
+import json
+import gzip
+import glob
+import time
+import tempfile
+
+import merge
+from merge import SECTION_KEYS, simplified_html, merge_simplified_html
+from instrumentation import StageTimer
+
+# Peak RSS comes from getrusage, which only exists on Unix
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def save_page_snapshot(capture_dir: str, article: dict, pages: dict) -> str:
+    """Saves the raw page_source captured for each section as <capture_dir>/<article_id>.json.gz."""
+    os.makedirs(capture_dir, exist_ok=True)
+    path = os.path.join(capture_dir, f"{article['jid']}{article['aid']}.json.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump({"article": article, "captured_at": time.time(), "pages": pages}, f)
+    return path
+
+
+def load_page_snapshots(corpus_dir: str):
+    """Yields (article, pages) for every snapshot in the corpus, in file-name order."""
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "*.json.gz"))):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        yield snapshot["article"], snapshot["pages"]
+
+
+def run_benchmark(corpus_dir: str, repeat: int = 1, output_path: str = None) -> dict:
+    """
+    Replays a captured snapshot corpus through simplified_html and merge_simplified_html with
+    no browser, and reports articles/sec, peak RSS and per-section parse time.
+    """
+    snapshots = list(load_page_snapshots(corpus_dir))
+    if not snapshots:
+        raise SystemExit(f"No *.json.gz snapshots found in {corpus_dir}")
+
+    timer = StageTimer()
+    articles_done = 0
+    with tempfile.TemporaryDirectory(prefix="report-bench-") as work_dir:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for article, pages in snapshots:
+                article_id = f"{article['jid']}{article['aid']}"
+                extracted_parts = {key: '' for key in SECTION_KEYS}
+                for section, page_html in pages.items():
+                    with timer.stage(f"parse:{section}", article_id):
+                        extracted_parts[section] = simplified_html(page_html, article_id, section, article).get(section, '')
+                with timer.stage("merge", article_id):
+                    merge_simplified_html(article_id.lower(), article, extracted_parts, work_dir)
+                articles_done += 1
+        elapsed = time.perf_counter() - start
+
+    result = {
+        "parser": merge.HTML_PARSER,
+        "articles": articles_done,
+        "seconds": round(elapsed, 3),
+        "articles_per_sec": round(articles_done / elapsed, 2) if elapsed else None,
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None,
+        "stages": timer.summary(),
+    }
+
+    print(f"📊 {articles_done} articles in {elapsed:.2f}s ({result['articles_per_sec']} articles/sec, parser={merge.HTML_PARSER})")
+    print(f"📊 Peak RSS: {result['peak_rss_mb']} MB")
+    for stage, stats in sorted(result["stages"].items()):
+        print(f"📊 {stage}: p50={stats['p50'] * 1000:.1f}ms p95={stats['p95'] * 1000:.1f}ms max={stats['max'] * 1000:.1f}ms")
+
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    return result
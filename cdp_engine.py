@@ -0,0 +1,467 @@
+"""
+Drives many articles at once inside the one authenticated Chrome: every article gets its own
+browser tab, and all tabs are controlled over the Chrome DevTools Protocol from a single
+asyncio event loop, sharing the cookies login() put in the browser.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import shutil
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# The engine speaks CDP over a websocket; only needed with --engine cdp
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+import fetch
+from merge import SECTION_KEYS, report_id, simplified_html, merge_simplified_html
+from ledger import STAGE_DONE, STAGE_FAILED
+from instrumentation import timings
+from scheduler import scheduler
+from benchmark import save_page_snapshot
+
+CDP_CALL_TIMEOUT = 60
+DOWNLOAD_START_TIMEOUT = 30
+DOWNLOAD_FINISH_TIMEOUT = 120
+# How long a loaded page's iframe gets to create its document, like the WebDriver loop's iframe wait
+FRAME_CONTEXT_TIMEOUT = 10
+
+
+class CdpError(Exception):
+    pass
+
+
+def portal_failed(error: Exception) -> bool:
+    """fetch.portal_failed(), plus DevTools errors and timeouts, as this engine's breaker counts them."""
+    if isinstance(error, (CdpError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if websockets is not None and isinstance(error, websockets.WebSocketException):
+        return True
+    return fetch.portal_failed(error)
+
+
+class CdpConnection:
+    """
+    One websocket to the browser target. Page sessions are multiplexed over it in flat mode,
+    so every tab's commands and events share a single connection and reader task.
+    """
+
+    def __init__(self, websocket):
+        self._ws = websocket
+        self._ids = itertools.count(1)
+        self._calls = {}  # command id -> future of its result
+        self._listeners = []  # (method, session_id, callback)
+        self._reader = asyncio.get_running_loop().create_task(self._read())
+
+    @classmethod
+    async def connect(cls, debugger_address: str):
+        """Connects to the browser behind a chromedriver session's goog:chromeOptions.debuggerAddress."""
+        def browser_url():
+            with urllib.request.urlopen(f"http://{debugger_address}/json/version", timeout=10) as response:
+                return json.load(response)["webSocketDebuggerUrl"]
+        return cls(await websockets.connect(await asyncio.to_thread(browser_url), max_size=None))
+
+    async def send(self, method: str, params: dict = None, session_id: str = None, timeout: float = CDP_CALL_TIMEOUT) -> dict:
+        call_id = next(self._ids)
+        message = {"id": call_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._calls[call_id] = future
+        try:
+            await self._ws.send(json.dumps(message))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._calls.pop(call_id, None)
+
+    def on(self, method: str, callback, session_id: str = None):
+        """Calls `callback(params)` for every matching event until the returned function is called."""
+        entry = (method, session_id, callback)
+        self._listeners.append(entry)
+        return lambda: self._listeners.remove(entry) if entry in self._listeners else None
+
+    def expect(self, method: str, session_id: str = None, predicate=None) -> asyncio.Future:
+        """Future of the next matching event. Create it before triggering the event, then await it."""
+        future = asyncio.get_running_loop().create_future()
+
+        def callback(params):
+            if not future.done() and (predicate is None or predicate(params)):
+                future.set_result(params)
+
+        remove = self.on(method, callback, session_id)
+        future.add_done_callback(lambda _: remove())
+        return future
+
+    async def _read(self):
+        try:
+            async for raw in self._ws:
+                message = json.loads(raw)
+                if "id" in message:
+                    future = self._calls.get(message["id"])
+                    if future is not None and not future.done():
+                        if "error" in message:
+                            future.set_exception(CdpError(message["error"].get("message", "CDP error")))
+                        else:
+                            future.set_result(message.get("result", {}))
+                    continue
+                for method, session_id, callback in list(self._listeners):
+                    if method == message.get("method") and session_id in (None, message.get("sessionId")):
+                        callback(message.get("params", {}))
+        finally:
+            for future in self._calls.values():
+                if not future.done():
+                    future.set_exception(CdpError("DevTools connection closed"))
+
+    async def close(self):
+        self._reader.cancel()
+        await self._ws.close()
+
+
+class CdpTab:
+    """One browser tab attached over a CdpConnection, with the WebDriver-style helpers the pipeline needs."""
+
+    def __init__(self, connection: CdpConnection, target_id: str, session_id: str):
+        self.connection = connection
+        self.target_id = target_id
+        self.session_id = session_id
+        self._contexts = {}  # frame id -> id of the frame's main-world execution context
+
+    @classmethod
+    async def open(cls, connection: CdpConnection, blocked_urls=None):
+        target = await connection.send("Target.createTarget", {"url": "about:blank"})
+        attached = await connection.send("Target.attachToTarget", {"targetId": target["targetId"], "flatten": True})
+        tab = cls(connection, target["targetId"], attached["sessionId"])
+        connection.on("Runtime.executionContextCreated", tab._context_created, tab.session_id)
+        connection.on("Runtime.executionContextsCleared", lambda _: tab._contexts.clear(), tab.session_id)
+        connection.on("Runtime.executionContextDestroyed", tab._context_destroyed, tab.session_id)
+        await tab.send("Page.enable")
+        await tab.send("Runtime.enable")
+        if blocked_urls:
+            await tab.send("Network.enable")
+            await tab.send("Network.setBlockedURLs", {"urls": blocked_urls})
+        return tab
+
+    def _context_created(self, params):
+        context = params["context"]
+        aux = context.get("auxData") or {}
+        if aux.get("isDefault"):
+            self._contexts[aux.get("frameId")] = context["id"]
+
+    def _context_destroyed(self, params):
+        for frame_id, context_id in list(self._contexts.items()):
+            if context_id == params["executionContextId"]:
+                del self._contexts[frame_id]
+
+    async def send(self, method: str, params: dict = None, timeout: float = CDP_CALL_TIMEOUT) -> dict:
+        return await self.connection.send(method, params, self.session_id, timeout)
+
+    async def navigate(self, url: str, timeout: float):
+        """
+        Opens `url` and returns once its DOM is parsed (the eager page load strategy). The first
+        attempt gets the page-load wait learned so far; one that overruns it is retried after a
+        backoff under the rest of `timeout`.
+        """
+        first = scheduler.timeout("page_load", timeout)
+        start = time.perf_counter()
+        for attempt, limit in enumerate([first, timeout] if first < timeout else [timeout], 1):
+            loaded = self.connection.expect("Page.domContentEventFired", self.session_id)
+            await self.send("Page.navigate", {"url": url})
+            try:
+                await asyncio.wait_for(loaded, max(limit - (time.perf_counter() - start), 1))
+                break
+            except asyncio.TimeoutError:
+                scheduler.observe("page_load", limit)
+                if limit >= timeout:
+                    raise
+                await asyncio.sleep(scheduler.backoff(attempt))
+        scheduler.observe("page_load", time.perf_counter() - start)
+
+    async def frame_ids(self) -> list:
+        """Ids of the main frame and all nested frames, main frame first."""
+        tree = (await self.send("Page.getFrameTree"))["frameTree"]
+        ids, pending = [], [tree]
+        while pending:
+            node = pending.pop(0)
+            ids.append(node["frame"]["id"])
+            pending.extend(node.get("childFrames", []))
+        return ids
+
+    async def content_context(self, timeout: float = FRAME_CONTEXT_TIMEOUT):
+        """
+        Execution context of the first iframe, like the WebDriver loop switching into it; None for
+        a page without one. Waits up to `timeout` for a slow iframe's document to get its context.
+        """
+        deadline = time.perf_counter() + timeout
+        while True:
+            frame_ids = await self.frame_ids()
+            if len(frame_ids) < 2:
+                return None
+            context_id = self._contexts.get(frame_ids[1])
+            if context_id is not None:
+                return context_id
+            if time.perf_counter() >= deadline:
+                logging.warning(f"No execution context for the iframe after {timeout:.0f}s; using the page")
+                return None
+            await asyncio.sleep(0.1)
+
+    async def evaluate(self, expression: str, context_id: int = None, timeout: float = CDP_CALL_TIMEOUT):
+        params = {"expression": expression, "awaitPromise": True, "returnByValue": True}
+        if context_id is not None:
+            params["contextId"] = context_id
+        result = await self.send("Runtime.evaluate", params, timeout)
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            raise CdpError((details.get("exception") or {}).get("description") or details.get("text"))
+        return result["result"].get("value")
+
+    async def run_script(self, script: str, *args, is_async: bool = False, context_id: int = None,
+                         timeout: float = CDP_CALL_TIMEOUT):
+        """Runs a WebDriver-style script (`arguments`, `return`; async ones call their last argument)."""
+        arguments = json.dumps(list(args))
+        if is_async:
+            expression = (f"new Promise(function (resolve) {{ (function () {{ {script} }})"
+                          f".apply(null, {arguments}.concat([resolve])); }})")
+        else:
+            expression = f"(function () {{ {script} }}).apply(null, {arguments})"
+        return await self.evaluate(expression, context_id, timeout)
+
+    async def close(self):
+        try:
+            await self.connection.send("Target.closeTarget", {"targetId": self.target_id})
+        except CdpError:
+            pass
+
+
+class CdpEngine:
+    """
+    Processes articles in `tabs` concurrent browser tabs of the Chrome behind `driver`. Each
+    tab captures its article's containers with the same script as capture_tab(), clicks the
+    unedited .docx link and collects the download by its CDP guid, then the article is parsed,
+    recorded, merged and cached like process_article() does.
+    """
+
+    def __init__(self, driver, download_dir: str, tabs: int = 10, session=None, ledger=None, section_cache=None,
+                 capture_dir: str = None, pipeline=None):
+        if websockets is None:
+            raise SystemExit("--engine cdp needs the 'websockets' package (pip install websockets)")
+        self.driver = driver
+        self.download_dir = download_dir
+        self.tabs = tabs
+        self.session = session
+        self.ledger = ledger
+        self.section_cache = section_cache
+        self.capture_dir = capture_dir
+        self.pipeline = pipeline
+        self.download_root = os.path.join(download_dir, ".cdp-downloads")
+        self._downloads = {}  # guid -> future of its final state
+        self._reauth_lock = None
+        # One thread per tab to block in the circuit breaker, so waiting tabs never hold the default
+        # executor that the trial article's parse, merge and re-login run on
+        self._breaker_waits = None
+        self.connection = None
+
+    async def run(self, articles):
+        """Feeds `articles` to the tabs until it is exhausted."""
+        self._reauth_lock = asyncio.Lock()
+        self._breaker_waits = ThreadPoolExecutor(max_workers=self.tabs, thread_name_prefix="cdp-breaker")
+        os.makedirs(self.download_root, exist_ok=True)
+        debugger_address = self.driver.capabilities["goog:chromeOptions"]["debuggerAddress"]
+        self.connection = await CdpConnection.connect(debugger_address)
+        # Downloads are saved under their guid so concurrent tabs can't collide, then moved per article
+        self.connection.on("Browser.downloadWillBegin", self._download_began)
+        self.connection.on("Browser.downloadProgress", self._download_progress)
+        await self.connection.send("Browser.setDownloadBehavior", {
+            "behavior": "allowAndName", "downloadPath": self.download_root, "eventsEnabled": True,
+        })
+        try:
+            pending = iter(articles)
+            await asyncio.gather(*(self._tab_worker(n, pending) for n in range(1, self.tabs + 1)))
+        finally:
+            await self.connection.close()
+            self._breaker_waits.shutdown(wait=False)
+
+    def _download_began(self, params):
+        self._downloads[params["guid"]] = asyncio.get_running_loop().create_future()
+
+    def _download_progress(self, params):
+        future = self._downloads.get(params["guid"])
+        if future is not None and not future.done() and params["state"] in ("completed", "canceled"):
+            future.set_result(params["state"])
+
+    async def _tab_worker(self, worker_id: int, pending):
+        tab = await CdpTab.open(self.connection, fetch.LEAN_BLOCKED_URLS if fetch.LEAN_BROWSER else None)
+        try:
+            for article in pending:
+                # The breaker can hold this tab back while the portal is failing; that wait is off the event loop
+                trial = await asyncio.get_running_loop().run_in_executor(self._breaker_waits, scheduler.before_article)
+                try:
+                    ok = await self.process_article(tab, article)
+                except Exception as e:
+                    logging.error(f"[tab {worker_id}] Failed to process article {article['jid']}{article['aid']}: {e}")
+                    ok = False if portal_failed(e) else None
+                scheduler.after_article(ok, trial)
+        finally:
+            await tab.close()
+
+    async def _guarded(self, tab: CdpTab, stage, article_url: str):
+        """Runs a tab stage; if the portal bounced it to login.aspx, re-authenticates once and retries."""
+        result = await stage()
+        if "login.aspx" not in (await tab.evaluate("location.href") or "").lower():
+            return result
+        if self.session is None:
+            raise CdpError("Session expired and no session manager to re-authenticate with")
+        async with self._reauth_lock:
+            logging.warning("🔑 Session expired mid-run; re-authenticating and retrying the current stage")
+            # The WebDriver tab shares the browser's cookie jar, so logging in there revives every tab
+            await asyncio.to_thread(self.session.reauthenticate, self.driver)
+        await tab.navigate(article_url, fetch.TAB_READY_TIMEOUTS["Article"])
+        return await stage()
+
+    async def capture(self, tab: CdpTab, tab_name: str, sections, context_id=None, timeout: float = None) -> dict:
+        operation = f"tab:{tab_name or 'Article'}"
+        ceiling = fetch.TAB_READY_TIMEOUTS[tab_name or "Article"] if timeout is None else timeout
+        timeout = scheduler.timeout(operation, ceiling)
+        specs = [dict(fetch.SECTION_CAPTURE[section], section=section) for section in sections]
+        start = time.perf_counter()
+        result = await tab.run_script(fetch.CAPTURE_TAB_SCRIPT, tab_name, specs, int(timeout * 1000), is_async=True,
+                                      context_id=context_id, timeout=timeout + 30)
+        if result["tab_found"] and not result["ready"] and timeout < ceiling:
+            # Overran the learned wait: select the tab again after a backoff, for the rest of the ceiling
+            await asyncio.sleep(scheduler.backoff(1))
+            remaining = max(ceiling - (time.perf_counter() - start), 1)
+            result = await tab.run_script(fetch.CAPTURE_TAB_SCRIPT, tab_name, specs, int(remaining * 1000), is_async=True,
+                                          context_id=context_id, timeout=remaining + 30)
+            timeout = ceiling
+        scheduler.observe(operation, time.perf_counter() - start)
+        if not result["tab_found"]:
+            raise RuntimeError(f"{tab_name} tab not found in the RadTabStrip")
+        if not result["ready"]:
+            logging.warning(f"⏱️ {tab_name or 'Current'} tab not ready after {timeout:.0f}s; captured what rendered")
+        return {section: result["sections"].get(section) or '' for section in sections}
+
+    async def _capture_in_content(self, tab: CdpTab, tab_name: str, sections, timeout: float = None) -> dict:
+        """capture() inside the content iframe, looked up on every call: a re-navigation replaces its context."""
+        return await self.capture(tab, tab_name, sections, await tab.content_context(), timeout)
+
+    async def download_docx(self, tab: CdpTab, normalized_id: str, article_dir: str):
+        """Clicks the unedited .docx link in the content iframe and moves the finished download into `article_dir`."""
+        context_id = await tab.content_context()
+        links = await tab.run_script(fetch.ANCHOR_SCAN_SCRIPT, context_id=context_id)
+        index = next((i for i, (text, href) in enumerate(links) if fetch.is_unedited_docx_link(text, href, normalized_id)), None)
+        if index is None:
+            print(f"⚠️ No unedited .docx link found for article {normalized_id}")
+            return None
+        frame_ids = set(await tab.frame_ids())
+        began = self.connection.expect("Browser.downloadWillBegin", predicate=lambda p: p.get("frameId") in frame_ids)
+        await tab.run_script(fetch.ANCHOR_CLICK_SCRIPT, index, context_id=context_id)
+        started = await asyncio.wait_for(began, DOWNLOAD_START_TIMEOUT)
+        state = await asyncio.wait_for(self._downloads[started["guid"]], DOWNLOAD_FINISH_TIMEOUT)
+        self._downloads.pop(started["guid"], None)
+        if state != "completed":
+            print(f"❌ Download of {started['suggestedFilename']} was canceled")
+            return None
+        destination_path = os.path.join(article_dir, started["suggestedFilename"])
+        shutil.move(os.path.join(self.download_root, started["guid"]), destination_path)
+        print(f"✅ File downloaded to: {destination_path}")
+        return destination_path
+
+    async def process_article(self, tab: CdpTab, article: dict):
+        jid, aid = article["jid"], article["aid"]
+        article_id = f"{jid}{aid}"
+        normalized_id = report_id(article_id)
+        print(f"✅ Processing article: {article_id}")
+        article_start = time.perf_counter()
+        ledger = self.ledger
+
+        def record(stage, output=None, error=None):
+            if ledger is not None:
+                ledger.mark(jid, aid, stage, STAGE_FAILED if error else STAGE_DONE, output, error)
+
+        done = ledger.completed_stages(jid, aid) if ledger is not None else {}
+        extracted_parts = {key: done.get(key) or '' for key in SECTION_KEYS}
+        captured_pages = {}
+        article_dir = os.path.join(self.download_dir, article_id)
+        os.makedirs(article_dir, exist_ok=True)
+        article_url = fetch.smart_url(f"MaintainArticle.aspx?articleid={aid}")
+        portal_ok = True
+
+        async def load():
+            await tab.navigate(article_url, fetch.TAB_READY_TIMEOUTS["Article"])
+
+        with timings.stage("page_load", article_id):
+            await self._guarded(tab, load, article_url)
+        record("page_loaded")
+
+        if "article_info" not in done:
+            captured_pages["article_info"] = (await self.capture(tab, None, ["article_info"]))["article_info"]
+
+        if "Attachments" not in done or "docx" not in done:
+            with timings.stage("tab:Attachments", article_id):
+                pages = await self._guarded(tab, lambda: self._capture_in_content(tab, "Attachments", ["Attachments"], 30),
+                                            article_url)
+            captured_pages["Attachments"] = pages["Attachments"]
+            if "docx" not in done:
+                signature = fetch.attachment_signature(pages["Attachments"], normalized_id)
+                try:
+                    with timings.stage("docx_download", article_id):
+                        downloaded = await self.download_docx(tab, normalized_id, article_dir)
+                except Exception as e:
+                    # Like the WebDriver path: a failed download is recorded and the other tabs still captured
+                    logging.warning(f"⚠️ Error downloading the unedited .docx for article {aid}: {e}")
+                    record("docx", error=str(e) or type(e).__name__)
+                    if portal_failed(e):
+                        portal_ok = False
+                else:
+                    if downloaded:
+                        record("docx", signature)
+                    else:
+                        record("docx", error="unedited .docx not downloaded")
+                        # No link on the Attachments tab is missing content, not the portal failing
+                        if signature is not None:
+                            portal_ok = False
+
+        for tab_name, section, _ in fetch.SECTION_TABS:
+            if section in done:
+                continue
+            try:
+                with timings.stage(f"tab:{tab_name}", article_id):
+                    pages = await self._guarded(tab, lambda: self._capture_in_content(tab, tab_name, [section]), article_url)
+                captured_pages[section] = pages[section]
+            except Exception as e:
+                logging.warning(f"⚠️ Error capturing {tab_name} for article {aid}: {e}")
+                record(section, error=str(e))
+                if portal_failed(e):
+                    portal_ok = False
+
+        # Parsing runs off the event loop: in the extraction pool when there is one, else a thread
+        loop = asyncio.get_running_loop()
+        for section, page_html in captured_pages.items():
+            if section == "Attachments" and "Attachments" in done:
+                continue
+            if self.pipeline is not None:
+                processed_html, seconds = await asyncio.wrap_future(
+                    self.pipeline.extract(page_html, f"{article_id}_{section}.html", section, article))
+                timings.record(f"parse:{section}", article_id, seconds)
+            else:
+                with timings.stage(f"parse:{section}", article_id):
+                    processed_html = await loop.run_in_executor(
+                        None, simplified_html, page_html, f"{article_id}_{section}.html", section, article)
+            extracted_parts[section] = processed_html.get(section, '')
+            record(section, extracted_parts[section])
+
+        if self.capture_dir and captured_pages:
+            save_page_snapshot(self.capture_dir, article, captured_pages)
+
+        with timings.stage("merge", article_id):
+            await loop.run_in_executor(None, merge_simplified_html, normalized_id, article, extracted_parts, self.download_dir)
+        if self.section_cache is not None:
+            self.section_cache.mark_rendered(jid, aid, self.section_cache.put(jid, aid, extracted_parts))
+        record("merged")
+        timings.record("article", article_id, time.perf_counter() - article_start)
+        return portal_ok
@@ -0,0 +1,277 @@
+"""
+Sends finished merged reports to copy-editors: grouped by recipient and JID, in batches over one
+reused SMTP connection, rate limited, and recorded in a send ledger so a retried run never mails
+the same report twice.
+
+To try it locally, run a debugging SMTP server and point SMTP_HOST/SMTP_PORT at it:
+    python -m aiosmtpd -n -l localhost:1025
+"""
+import os
+import re
+import csv
+import glob
+import time
+import gzip
+import zipfile
+import sqlite3
+import smtplib
+import hashlib
+import logging
+import threading
+from io import BytesIO
+from email.message import EmailMessage
+from email.utils import make_msgid, formatdate
+
+from merge import REPORT_CSS, REPORT_CSS_NAME, report_id, find_merged_report
+
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 25))
+SMTP_USER = os.getenv("SMTP_USER")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+# "starttls", "ssl" or "none"
+SMTP_SECURITY = os.getenv("SMTP_SECURITY", "none")
+EMAIL_FROM = os.getenv("EMAIL_FROM", "reports@localhost")
+
+# A connection idle for longer than this is checked with NOOP before it is reused
+SMTP_IDLE_CHECK = 60
+
+DOCX_MIME = ("application", "vnd.openxmlformats-officedocument.wordprocessingml.document")
+
+
+class SendLedger:
+    """
+    Which report (by content hash) was mailed to which recipient, kept in SQLite so a
+    retried or repeated dispatch skips what already went out. A re-rendered report that
+    changed has a new hash and is sent again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS sent (
+                    jid TEXT NOT NULL,
+                    aid INTEGER NOT NULL,
+                    recipient TEXT NOT NULL,
+                    report_hash TEXT NOT NULL,
+                    message_id TEXT,
+                    sent_at REAL NOT NULL,
+                    PRIMARY KEY (jid, aid, recipient, report_hash)
+                )
+            """)
+            self._conn.commit()
+
+    def was_sent(self, jid: str, aid: int, recipient: str, report_hash: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM sent WHERE jid = ? AND aid = ? AND recipient = ? AND report_hash = ?",
+                (jid, aid, recipient, report_hash),
+            ).fetchone()
+        return row is not None
+
+    def mark_sent(self, items, recipient: str, message_id: str):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sent (jid, aid, recipient, report_hash, message_id, sent_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(item["jid"], item["aid"], recipient, item["report_hash"], message_id, time.time()) for item in items],
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SmtpConnection:
+    """
+    One SMTP connection reused for every message, opened on first use, checked with NOOP
+    after sitting idle and reopened once if the server dropped it. Sends are spaced so no
+    more than `rate_per_minute` messages go out per minute.
+    """
+
+    def __init__(self, host: str = SMTP_HOST, port: int = SMTP_PORT, user: str = SMTP_USER,
+                 password: str = SMTP_PASSWORD, security: str = SMTP_SECURITY, rate_per_minute: float = None,
+                 timeout: float = 30):
+        self.host, self.port, self.user, self.password = host, port, user, password
+        self.security = security
+        self.timeout = timeout
+        self.min_interval = 60.0 / rate_per_minute if rate_per_minute else 0
+        self._smtp = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        if self.security == "ssl":
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == "starttls":
+                smtp.starttls()
+        if self.user:
+            smtp.login(self.user, self.password or "")
+        self._smtp = smtp
+        print(f"📨 Connected to SMTP server {self.host}:{self.port}")
+
+    def _connection(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > SMTP_IDLE_CHECK:
+            try:
+                if self._smtp.noop()[0] != 250:
+                    self.close()
+            except smtplib.SMTPException:
+                self._smtp = None
+        if self._smtp is None:
+            self._connect()
+        return self._smtp
+
+    def send(self, message: EmailMessage):
+        wait = self._last_used + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            self._connection().send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Dropped between messages: reconnect once and resend
+            self._smtp = None
+            self._connection().send_message(message)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            self._smtp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_recipients(path: str = None, default: str = None) -> dict:
+    """
+    JID (lowercase) -> recipient addresses, from a CSV with JID and Email columns (several
+    addresses may be separated by ';'). A "*" JID row, or `default`, covers every other journal.
+    """
+    recipients = {}
+    if path:
+        with open(path, mode='r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                jid = (row.get("JID") or row.get("jid") or "").strip().lower()
+                emails = [e.strip() for e in (row.get("Email") or row.get("email") or "").split(";") if e.strip()]
+                if jid and emails:
+                    recipients.setdefault(jid, []).extend(emails)
+    if default and "*" not in recipients:
+        recipients["*"] = [e.strip() for e in default.split(";") if e.strip()]
+    return recipients
+
+
+def find_report_files(download_dir: str, jid: str, aid: int):
+    """The article's merged report and its downloaded .docx files; the report is None if not written yet."""
+    normalized_id = report_id(f"{jid}{aid}")
+    html_path = find_merged_report(download_dir, normalized_id)
+    if html_path is None:
+        return None, []
+    # The .docx lands in the folder named after the un-normalized article ID
+    folders = {os.path.join(download_dir, f"{jid}{aid}"), os.path.dirname(html_path)}
+    docx_paths = sorted({path for folder in folders for path in glob.glob(os.path.join(folder, "*.docx"))})
+    return html_path, docx_paths
+
+
+def read_report(html_path: str) -> str:
+    """The merged report's HTML, whether it was written plain or gzipped."""
+    opener = gzip.open if html_path.endswith(".gz") else open
+    with opener(html_path, "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+def standalone_report(html_path: str) -> bytes:
+    """The merged report with the shared stylesheet inlined, so it renders on its own as an attachment."""
+    html = read_report(html_path)
+    link = re.compile(r'<link rel="stylesheet" href="[^"]*' + re.escape(REPORT_CSS_NAME) + r'">')
+    return link.sub(lambda _: f"<style>{REPORT_CSS}</style>", html, count=1).encode("utf-8")
+
+
+def build_message(sender: str, recipient: str, jid: str, items: list, zip_attachments: bool = False) -> EmailMessage:
+    """One email carrying a batch of reports (and their .docx files) of one journal."""
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = recipient
+    message["Date"] = formatdate(localtime=True)
+    message["Message-ID"] = make_msgid()
+    message["Subject"] = f"Merged reports – {jid} ({len(items)} article{'s' if len(items) != 1 else ''})"
+    message.set_content("Merged reports attached for:\n\n" + "\n".join(f"  {item['article_id']}" for item in items) + "\n")
+
+    files = []  # (name, data)
+    for item in items:
+        files.append((f"{item['article_id']}_merged.html", standalone_report(item["html_path"])))
+        for docx_path in item["docx_paths"]:
+            with open(docx_path, "rb") as f:
+                files.append((os.path.basename(docx_path), f.read()))
+
+    if zip_attachments:
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name, data in files:
+                archive.writestr(name, data)
+        message.add_attachment(buffer.getvalue(), maintype="application", subtype="zip",
+                               filename=f"{jid}_reports_{len(items)}.zip")
+    else:
+        for name, data in files:
+            if name.endswith(".docx"):
+                message.add_attachment(data, maintype=DOCX_MIME[0], subtype=DOCX_MIME[1], filename=name)
+            else:
+                message.add_attachment(data, maintype="text", subtype="html", filename=name)
+    return message
+
+
+def dispatch_reports(articles, download_dir: str, send_ledger: SendLedger, recipients: dict, sender: str = EMAIL_FROM,
+                     batch_size: int = 20, rate_per_minute: float = None, zip_attachments: bool = False,
+                     smtp: SmtpConnection = None, dry_run: bool = False) -> int:
+    """
+    Mails every finished report in `articles` ((jid, aid) pairs) that the send ledger has not
+    recorded for its recipient yet: one message per `batch_size` reports of the same recipient
+    and JID, all over one SMTP connection. Returns the number of messages sent. A failed batch
+    is logged and left unrecorded, so the next run retries it.
+    """
+    batches = {}  # (recipient, jid) -> items
+    for jid, aid in articles:
+        html_path, docx_paths = find_report_files(download_dir, jid, aid)
+        if html_path is None:
+            continue
+        report_hash = hashlib.sha256(read_report(html_path).encode("utf-8")).hexdigest()
+        for recipient in recipients.get(jid.lower()) or recipients.get("*") or []:
+            if send_ledger.was_sent(jid, aid, recipient, report_hash):
+                continue
+            batches.setdefault((recipient, jid), []).append({
+                "jid": jid, "aid": aid, "article_id": f"{jid}{aid}", "html_path": html_path,
+                "docx_paths": docx_paths, "report_hash": report_hash,
+            })
+
+    if not batches:
+        print("🧹 No new reports to send")
+        return 0
+
+    sent = 0
+    smtp = smtp or SmtpConnection(rate_per_minute=rate_per_minute)
+    with smtp:
+        for (recipient, jid), items in sorted(batches.items()):
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                message = build_message(sender, recipient, jid, batch, zip_attachments)
+                if dry_run:
+                    print(f"📤 Would send {len(batch)} {jid} report(s) to {recipient}")
+                    continue
+                try:
+                    smtp.send(message)
+                except (smtplib.SMTPException, OSError) as e:
+                    logging.error(f"Failed to send {len(batch)} {jid} report(s) to {recipient}: {e}")
+                    continue
+                send_ledger.mark_sent(batch, recipient, message["Message-ID"])
+                sent += 1
+                print(f"📤 Sent {len(batch)} {jid} report(s) to {recipient}")
+    return sent
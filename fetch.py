@@ -0,0 +1,1515 @@
+"""The browser pipeline: login, tab capture, .docx download and the fetch run itself."""
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException, InvalidSessionIdException, \
+    WebDriverException
+from bs4 import SoupStrainer
+from dotenv import load_dotenv
+import time
+import os
+import csv
+import shutil
+import logging
+import pickle
+import queue
+import threading
+import re
+import sys
+import json
+import asyncio
+
+from merge import SECTION_KEYS, parse_html, report_id, find_merged_report, simplified_html, merge_simplified_html
+from ledger import JobLedger, STAGE_DONE, STAGE_FAILED
+from section_cache import SectionCache, section_fingerprint
+from instrumentation import timings
+from scheduler import scheduler
+from benchmark import save_page_snapshot
+from pipeline import ExtractionPipeline
+
+DEFAULT_BASE_URL = "https://journals.sageapps.com/smart/"
+
+# Set from --base-url by run_fetch()
+SMART_BASE_URL = os.getenv("SMART_BASE_URL", DEFAULT_BASE_URL)
+
+# ------------------ BROWSER PROFILE ------------------
+# Set from --page-load-strategy and --lean-browser by run_fetch(). Every page is followed by an
+# explicit readiness wait, so nothing needs the load event that "normal" waits for.
+PAGE_LOAD_STRATEGY = os.getenv("PAGE_LOAD_STRATEGY", "eager")
+LEAN_BROWSER = False
+# Ceiling for driver.get(); the scheduler learns a shorter first attempt from the run's page loads
+PAGE_LOAD_TIMEOUT = float(os.getenv("PAGE_LOAD_TIMEOUT", 180))
+# Set from --recycle-after and --max-browser-rss by run_fetch(); 0 turns either check off
+RECYCLE_AFTER_ARTICLES = int(os.getenv("BROWSER_RECYCLE_ARTICLES", 300))
+MAX_BROWSER_RSS_MB = float(os.getenv("BROWSER_MAX_RSS_MB", 1500))
+
+# Only the DOM is read, so images, fonts, media and trackers are never fetched in lean mode.
+# Stylesheets and scripts (WebResource.axd/ScriptResource.axd) stay: tab visibility and the
+# Telerik postbacks depend on them.
+LEAN_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.bmp", "*.ico", "*.svg", "*.webp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3", "*.wav", "*.ogg",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*hotjar.com*",
+]
+
+# Chrome features the scraper never uses
+LEAN_CHROME_ARGS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-client-side-phishing-detection",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication,InterestFeedContentSuggestions",
+    "--mute-audio",
+    "--no-first-run",
+    "--metrics-recording-only",
+]
+
+
+def create_driver(download_dir: str, headless: bool = False):
+    """Starts a Chrome session that saves downloads into `download_dir`."""
+    # optionally set path to chromedriver: Service(executable_path="path/to/chromedriver")
+    service = Service()
+
+    chrome_options = Options()
+    # remove/adjust headless if needed for debugging:
+    if headless:
+        chrome_options.add_argument("--headless=new")   # or comment out to watch the browser
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.page_load_strategy = PAGE_LOAD_STRATEGY
+    if LEAN_BROWSER:
+        for argument in LEAN_CHROME_ARGS:
+            chrome_options.add_argument(argument)
+
+    prefs = {
+        "download.default_directory": download_dir,
+        "download.prompt_for_download": False,
+        "download.directory_upgrade": True,
+        "safebrowsing.enabled": True,
+        "profile.default_content_settings.popups": 0,
+    }
+    if LEAN_BROWSER:
+        prefs["profile.managed_default_content_settings.images"] = 2
+        prefs["profile.default_content_setting_values.notifications"] = 2
+    chrome_options.add_experimental_option("prefs", prefs)
+    # Create driver with plain selenium
+    driver = webdriver.Chrome(service=service, options=chrome_options)
+
+    # Allow downloads via CDP
+    try:
+        driver.execute_cdp_cmd("Page.setDownloadBehavior", {
+            "behavior": "allow",
+            "downloadPath": download_dir
+        })
+    except Exception as e:
+        # on some Chrome/selenium versions this may fail; it's non-fatal
+        print("Warning: Page.setDownloadBehavior failed:", e)
+
+    if LEAN_BROWSER:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+        except Exception as e:
+            # Still works, just without request blocking
+            print("Warning: Network.setBlockedURLs failed:", e)
+
+    # increase page load timeout so slow pages don't immediately timeout
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    driver.set_script_timeout(CAPTURE_SCRIPT_TIMEOUT)
+    return driver
+
+
+# Renderer memory is read from the process table; without psutil only --recycle-after applies
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# WebDriver errors that mean the browser itself is gone, not just the current page
+DEAD_BROWSER_MESSAGES = ("chrome not reachable", "tab crashed", "disconnected", "no such window", "session deleted")
+
+
+def browser_died(error: Exception) -> bool:
+    if isinstance(error, InvalidSessionIdException):
+        return True
+    return isinstance(error, WebDriverException) and any(text in str(error).lower() for text in DEAD_BROWSER_MESSAGES)
+
+
+def portal_failed(error: Exception) -> bool:
+    """Whether `error` says the portal isn't answering (a timeout, WebDriver or HTTP error), as the breaker counts it."""
+    if isinstance(error, (TimeoutError, WebDriverException)):
+        return True
+    return requests is not None and isinstance(error, requests.RequestException)
+
+
+class ManagedDriver:
+    """
+    Owns a run's or worker's Chrome and stands in for its driver. Chrome starts, with the session's
+    saved cookies so no login is needed, the first time anything touches it, so with tabs read over
+    HTTP it may never start. article_done() restarts it every RECYCLE_AFTER_ARTICLES articles or
+    once its renderers' RSS passes MAX_BROWSER_RSS_MB; respawn() replaces one that died.
+    """
+
+    def __init__(self, download_dir: str, session=None, headless: bool = False):
+        self.download_dir = download_dir
+        self.session = session
+        self.headless = headless
+        self.articles = 0
+        self._driver = None
+
+    def __getattr__(self, name):
+        if self._driver is None:
+            print("🌐 Starting Chrome")
+            self._driver = create_driver(self.download_dir, self.headless)
+            if self.session is not None and self.session.cookies:
+                self.session.apply(self._driver, force=True)
+        return getattr(self._driver, name)
+
+    def renderer_rss_mb(self) -> float:
+        """Resident memory of Chrome's renderer processes in MB, or None where it can't be measured."""
+        if psutil is None or self._driver is None:
+            return None
+        try:
+            processes = psutil.Process(self._driver.service.process.pid).children(recursive=True)
+            renderers = [p for p in processes if "--type=renderer" in " ".join(p.cmdline())]
+            return sum(p.memory_info().rss for p in renderers or processes) / 2 ** 20
+        except (psutil.Error, AttributeError):
+            return None
+
+    def article_done(self):
+        """Counts an article on this browser and restarts it when it has served enough or grown too big."""
+        if self._driver is None:
+            return
+        self.articles += 1
+        if RECYCLE_AFTER_ARTICLES and self.articles >= RECYCLE_AFTER_ARTICLES:
+            self.restart(f"after {self.articles} articles")
+            return
+        rss = self.renderer_rss_mb() if MAX_BROWSER_RSS_MB else None
+        if rss is not None and rss > MAX_BROWSER_RSS_MB:
+            self.restart(f"renderer RSS {rss:.0f} MB over {MAX_BROWSER_RSS_MB:.0f} MB")
+
+    def restart(self, reason: str):
+        """Quits Chrome; the next use starts a fresh one with the current cookies."""
+        print(f"♻️ Restarting Chrome ({reason})")
+        self.quit()
+        self.articles = 0
+
+    def respawn(self, error: Exception):
+        logging.warning(f"💥 Browser session died ({str(error).splitlines()[0] if str(error) else type(error).__name__}); "
+                        f"starting a new one")
+        self.restart("dead session")
+
+    def quit(self):
+        if self._driver is not None:
+            driver, self._driver = self._driver, None
+            try:
+                driver.quit()
+            except WebDriverException as e:
+                logging.warning(f"Error quitting Chrome: {e}")
+
+
+COOKIES_FILE = "sage_cookies.pkl"
+
+
+def smart_url(page: str) -> str:
+    """Absolute URL of a SMART portal page under the configured base URL."""
+    return SMART_BASE_URL + page
+
+def login(driver, login_id, login_pwd, session=None):
+    if session is None:
+        session = SessionManager(login_id, login_pwd)
+    driver.get(smart_url("login.aspx"))
+    print(f"Current URL after navigation: {driver.current_url}")
+    
+    # Reuse saved cookies while the portal still accepts them
+    cookies_valid = False
+    if session.load():
+        expires = session.expires_at()
+        if expires is None:
+            print("Saved cookies are session cookies (no expiry)")
+        else:
+            print(f"Saved cookies expire in {(expires - time.time())/60:.1f} minutes")
+        if session.is_alive(driver):
+            session.apply(driver, force=True)
+            print("*** Session is active - cookies are valid")
+            cookies_valid = True
+        else:
+            print("* Session expired - redirected to login page")
+    
+    # If cookies aren't valid or don't exist, perform manual login
+    if not cookies_valid:
+        print("Performing manual login...")
+        driver.get(smart_url("login.aspx"))
+        try:
+            username_field = WebDriverWait(driver, 30).until(
+                EC.presence_of_element_located((By.ID, "ctl00_SmartMasterContent_rtbuserlogin"))    
+            )
+            password_field = driver.find_element(By.ID, "ctl00_SmartMasterContent_rtbpasswd")
+
+            username_field.send_keys(login_id)
+            password_field.send_keys(login_pwd)
+            
+            # Try to find and click the sign-in button
+            # Try to find and click the sign-in button safely
+            try:
+                sign_in_button = WebDriverWait(driver, 30).until(
+                    EC.element_to_be_clickable((By.ID, "ctl00_SmartMasterContent_rblogin_input"))
+                )
+                sign_in_button.click()
+            except TimeoutException:
+                # If button not found or not clickable, try submitting with Enter key
+                print("Sign in button not clickable, submitting with Enter key")
+                password_field.send_keys(Keys.RETURN)
+
+
+            # Wait for login to complete by checking URL change
+            WebDriverWait(driver, 30).until(
+                lambda d: "login.aspx" not in d.current_url
+            )
+            print("*** Manual login successful. Saving cookies...")
+
+            # Save cookies for future use
+            session.adopt_driver_cookies(driver)
+            
+        except Exception as e:
+            print(f"Login error: {e}")
+            print("Current page title:", driver.title)
+            print("Current URL:", driver.current_url)
+            raise
+
+
+# ------------------ SESSION ------------------
+# The forms-authentication cookie whose expiry decides when the session has to be renewed
+AUTH_COOKIE = os.getenv("AUTH_COOKIE", ".ASPXAUTH")
+# Re-login this long before the auth cookie expires, but never earlier than this fraction of its lifetime
+SESSION_REFRESH_MARGIN = float(os.getenv("SESSION_REFRESH_MARGIN", 300))
+SESSION_REFRESH_FRACTION = 0.25
+# Least time between two background logins, however short-lived the cookie the portal hands out
+SESSION_MIN_REFRESH_INTERVAL = float(os.getenv("SESSION_MIN_REFRESH_INTERVAL", 30))
+# How often the background refresher re-checks a session whose cookies carry no expiry
+SESSION_CHECK_INTERVAL = float(os.getenv("SESSION_CHECK_INTERVAL", 300))
+
+
+class SessionManager:
+    """
+    Owns the portal login for the whole run. It knows when each saved cookie really
+    expires, checks cheaply over HTTP whether the session is alive, logs in again in the
+    background before the auth cookie expires, and re-authenticates a driver that gets
+    bounced to login.aspx mid-run. Drivers pick up refreshed cookies through apply(),
+    always from the thread that owns them.
+    """
+
+    def __init__(self, login_id: str, login_pwd: str, cookies_file: str = COOKIES_FILE):
+        self.login_id = login_id
+        self.login_pwd = login_pwd
+        self.cookies_file = cookies_file
+        self.cookies = []
+        self.version = 0
+        self.cookies_set_at = time.time()
+        self._applied = {}  # driver session id -> cookie version it has
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._refresher = None
+
+    # -------- cookie store --------
+    def load(self) -> bool:
+        """Loads the saved cookies, dropping any past their own expiry. True if some are left."""
+        if not os.path.exists(self.cookies_file):
+            return False
+        try:
+            with open(self.cookies_file, "rb") as f:
+                cookies = pickle.load(f)
+        except Exception as e:
+            print(f"Error loading cookies: {e}")
+            return False
+        now = time.time()
+        live = [cookie for cookie in cookies if cookie.get("expiry") is None or cookie["expiry"] > now]
+        if len(live) < len(cookies):
+            print(f"Dropped {len(cookies) - len(live)} expired cookie(s)")
+        self._set_cookies(live, save=False)
+        return bool(live)
+
+    def _set_cookies(self, cookies: list, save: bool = True):
+        with self._lock:
+            self.cookies = cookies
+            self.cookies_set_at = time.time()
+            self.version += 1
+            if save:
+                with open(self.cookies_file, "wb") as f:
+                    pickle.dump(cookies, f)
+
+    def adopt_driver_cookies(self, driver):
+        """Takes over (and saves) the cookies of a driver that has just logged in."""
+        self._set_cookies(driver.get_cookies())
+        self._applied[driver.session_id] = self.version
+
+    def expires_at(self) -> float:
+        """Expiry of the auth cookie, or None when it is a session cookie (or there is none)."""
+        with self._lock:
+            expiries = [cookie["expiry"] for cookie in self.cookies if cookie["name"] == AUTH_COOKIE and cookie.get("expiry")]
+        return min(expiries) if expiries else None
+
+    def refresh_due_at(self) -> float:
+        """When the background refresher should log in again, or None while the auth cookie has no expiry."""
+        expires = self.expires_at()
+        if expires is None:
+            return None
+        with self._lock:
+            lifetime = max(expires - self.cookies_set_at, 0)
+        return expires - min(SESSION_REFRESH_MARGIN, lifetime * SESSION_REFRESH_FRACTION)
+
+    def apply(self, driver, force: bool = False):
+        """Copies the current cookies into `driver` unless it already has this version."""
+        with self._lock:
+            cookies, version = list(self.cookies), self.version
+        if not force and self._applied.get(driver.session_id) == version:
+            return
+        if SMART_BASE_URL.split("/")[2] not in driver.current_url:
+            # Cookies can only be set for the domain the browser is on
+            driver.get(smart_url("login.aspx"))
+        for cookie in cookies:
+            driver.add_cookie(cookie)
+        self._applied[driver.session_id] = version
+
+    # -------- liveness and login --------
+    def _http(self):
+        http = requests.Session()
+        for cookie in self.cookies:
+            http.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/"))
+        return http
+
+    def is_alive(self, driver=None) -> bool:
+        """One cheap request to default.aspx; the session is dead if it redirects to the login page."""
+        if requests is None:
+            if driver is None:
+                return False
+            self.apply(driver, force=True)
+            driver.get(smart_url("default.aspx"))
+            return "login.aspx" not in driver.current_url.lower()
+        try:
+            response = self._http().get(smart_url("default.aspx"), allow_redirects=False, timeout=15)
+        except requests.RequestException as e:
+            logging.warning(f"Session check failed: {e}")
+            return False
+        return response.status_code == 200
+
+    def login_http(self) -> bool:
+        """Submits the login form over HTTP (no browser). False if the portal didn't accept it."""
+        if requests is None:
+            return False
+        try:
+            http = requests.Session()
+            page = http.get(smart_url("login.aspx"), timeout=30)
+            soup = parse_html(page.text)
+            form = soup.find("form")
+            username = soup.find("input", id="ctl00_SmartMasterContent_rtbuserlogin")
+            password = soup.find("input", id="ctl00_SmartMasterContent_rtbpasswd")
+            button = soup.find("input", id="ctl00_SmartMasterContent_rblogin_input")
+            if form is None or username is None or password is None:
+                return False
+            fields = form_fields(form)
+            fields[username["name"]] = self.login_id or ""
+            fields[password["name"]] = self.login_pwd or ""
+            if button is not None and button.get("name"):
+                fields[button["name"]] = button.get("value", "")
+            response = http.post(requests.compat.urljoin(page.url, form.get("action") or page.url), data=fields, timeout=30)
+        except requests.RequestException as e:
+            logging.warning(f"HTTP login failed: {e}")
+            return False
+        if "login.aspx" in response.url.lower():
+            return False
+        self._set_cookies([
+            {
+                "name": cookie.name, "value": cookie.value, "domain": cookie.domain, "path": cookie.path,
+                "secure": cookie.secure, "httpOnly": cookie.has_nonstandard_attr("HttpOnly"),
+                **({"expiry": int(cookie.expires)} if cookie.expires else {}),
+            }
+            for cookie in http.cookies
+        ])
+        print("*** Session refreshed over HTTP")
+        return True
+
+    def reauthenticate(self, driver):
+        """Logs `driver` back in after a bounce to login.aspx, reusing a refresh another thread already did."""
+        with self._lock:
+            if self._applied.get(driver.session_id) != self.version and self.is_alive():
+                self.apply(driver)
+                return
+            if self.login_http():
+                self.apply(driver)
+                return
+            login(driver, self.login_id, self.login_pwd, self)
+
+    def run_stage(self, driver, stage_fn, reopen=None):
+        """
+        Runs one driver stage. If it ends on login.aspx, re-authenticates and retries just that
+        stage, calling `reopen` first when the stage needs the article page back.
+        """
+        self.apply(driver)
+        try:
+            result = stage_fn()
+            if not _on_login_page(driver):
+                return result
+        except Exception:
+            if not _on_login_page(driver):
+                raise
+        logging.warning("🔑 Session expired mid-run; re-authenticating and retrying the current stage")
+        self.reauthenticate(driver)
+        if reopen is not None:
+            reopen()
+        return stage_fn()
+
+    # -------- background refresh --------
+    def start_refresher(self):
+        self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        refreshed = False
+        while True:
+            due_at = self.refresh_due_at()
+            due_in = SESSION_CHECK_INTERVAL if due_at is None else due_at - time.time()
+            if refreshed:
+                # Never log in back to back, even when the new cookie is already inside its margin
+                due_in = max(due_in, SESSION_MIN_REFRESH_INTERVAL)
+            refreshed = False
+            if self._stop.wait(max(min(due_in, SESSION_CHECK_INTERVAL), 0)):
+                return
+            if due_at is not None and time.time() < due_at:
+                continue
+            # Session cookies carry no expiry: a periodic check keeps the sliding expiry alive and spots the end
+            if due_at is None and self.is_alive():
+                continue
+            refreshed = self.login_http()
+            if not refreshed:
+                logging.warning("Background re-login failed; drivers will re-authenticate when bounced to login.aspx")
+                self._stop.wait(SESSION_CHECK_INTERVAL)
+
+
+def _on_login_page(driver) -> bool:
+    """Whether the document the driver is in is login.aspx: inside the article iframe, the iframe's own URL."""
+    try:
+        url = driver.execute_script("return document.URL")
+    except Exception:
+        try:
+            url = driver.current_url
+        except Exception:
+            return False
+    return "login.aspx" in (url or "").lower()
+
+
+def run_stage(driver, session, stage_fn, reopen=None):
+    """Runs a driver stage through the session manager's re-login-and-retry guard, if there is one."""
+    if session is None:
+        return stage_fn()
+    return session.run_stage(driver, stage_fn, reopen)
+
+
+# ------------------ TAB READINESS ------------------
+
+# Element that signals each RadTabStrip tab has rendered its content
+TAB_READY_LOCATORS = {
+    "Article": (By.ID, "ArticleInfo"),
+    "Attachments": (By.ID, "ArticleAttachmentGrid"),
+    "Guidelines": (By.XPATH, "//fieldset[contains(@class, 'FormFieldset')]/legend[normalize-space(.)='Style']"),
+    "Authors": (By.ID, "ctl00_ArticleAuthors_uc_ArticleAuthorsGrid"),
+    "Problems/Notes": (By.ID, "ArticleProbNotes"),
+    "Comments": (By.ID, "ArticleComments"),
+}
+
+# Tabs visited after Attachments: (tab, section extracted from it, debug filename suffix)
+SECTION_TABS = [
+    ("Guidelines", "guidelines", "_guidelines"),
+    ("Authors", "author_info", "_authorinfo"),
+    ("Problems/Notes", "problem_notes", "_problemnotes"),
+    ("Comments", "comments", "_comments"),
+]
+
+# Ceiling in seconds for each readiness wait, overridable via e.g. TAB_WAIT_COMMENTS=20
+TAB_READY_TIMEOUTS = {
+    tab: float(os.getenv(f"TAB_WAIT_{tab.replace('/', '_').upper()}", default))
+    for tab, default in {
+        "Article": 30,
+        "Attachments": 15,
+        "Guidelines": 15,
+        "Authors": 15,
+        "Problems/Notes": 15,
+        "Comments": 15,
+    }.items()
+}
+
+# True when no ASP.NET AJAX partial postback is in flight (or the page has no PageRequestManager)
+AJAX_IDLE_SCRIPT = """
+if (typeof Sys === 'undefined' || !Sys.WebForms || !Sys.WebForms.PageRequestManager) { return true; }
+var prm = Sys.WebForms.PageRequestManager.getInstance();
+return !prm || !prm.get_isInAsyncPostBack();
+"""
+
+
+def load_page(driver, url: str):
+    """
+    driver.get() under the page-load timeout learned so far. A load that overruns it is
+    retried once after a backoff, under the remaining PAGE_LOAD_TIMEOUT.
+    """
+    timeout = scheduler.timeout("page_load", PAGE_LOAD_TIMEOUT)
+    start = time.perf_counter()
+    try:
+        driver.set_page_load_timeout(timeout)
+        driver.get(url)
+    except TimeoutException:
+        scheduler.observe("page_load", timeout)
+        if timeout >= PAGE_LOAD_TIMEOUT:
+            raise
+        delay = scheduler.backoff(1)
+        logging.warning(f"⏱️ Page load overran the learned {timeout:.1f}s; retrying in {delay:.1f}s")
+        time.sleep(delay)
+        driver.set_page_load_timeout(max(PAGE_LOAD_TIMEOUT - (time.perf_counter() - start), 1))
+        driver.get(url)
+    scheduler.observe("page_load", time.perf_counter() - start)
+
+
+def wait_for_tab_ready(driver, tab: str, timeout: float = None) -> bool:
+    """
+    Waits until the tab's container is present and the PageRequestManager is idle.
+    Returns False if the ceiling was hit; the caller carries on with whatever rendered.
+    """
+    if timeout is None:
+        timeout = TAB_READY_TIMEOUTS[tab]
+    locator = TAB_READY_LOCATORS[tab]
+    start = time.time()
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda d: d.execute_script(AJAX_IDLE_SCRIPT) and d.find_elements(*locator)
+        )
+        ready = True
+    except TimeoutException:
+        ready = False
+    elapsed = time.time() - start
+    scheduler.observe(f"tab:{tab}", elapsed)
+    if ready:
+        logging.info(f"⏱️ {tab} tab ready in {elapsed:.2f}s (ceiling {timeout:.0f}s)")
+    else:
+        logging.warning(f"⏱️ {tab} tab not ready after {elapsed:.2f}s (ceiling {timeout:.0f}s)")
+    return ready
+
+
+# Where each section's container is found by the capture script
+SECTION_CAPTURE = {
+    "guidelines": {"legend": "Style"},
+    "article_info": {"id": "ArticleInfo"},
+    "author_info": {"id": "ctl00_ArticleAuthors_uc_ArticleAuthorsGrid"},
+    "problem_notes": {"id": "ArticleProbNotes"},
+    "comments": {"id": "ArticleComments"},
+    "Attachments": {"id": "ArticleAttachmentGrid"},
+}
+
+# Allowance chromedriver gives an async script; the capture script enforces its own, shorter ceiling
+CAPTURE_SCRIPT_TIMEOUT = max(TAB_READY_TIMEOUTS.values()) + 30
+
+# Selects a tab through the RadTabStrip client API (falling back to clicking its header), waits
+# in the page until the PageRequestManager is idle and every requested container exists, then
+# hands back just those containers' outerHTML.
+CAPTURE_TAB_SCRIPT = """
+var tabText = arguments[0], specs = arguments[1], timeoutMs = arguments[2], done = arguments[arguments.length - 1];
+
+function ajaxIdle() {
+    if (typeof Sys === 'undefined' || !Sys.WebForms || !Sys.WebForms.PageRequestManager) { return true; }
+    var prm = Sys.WebForms.PageRequestManager.getInstance();
+    return !prm || !prm.get_isInAsyncPostBack();
+}
+
+function findContainer(spec) {
+    if (spec.id) { return document.getElementById(spec.id); }
+    var legends = document.querySelectorAll('fieldset legend');
+    for (var i = 0; i < legends.length; i++) {
+        if (legends[i].textContent.trim() === spec.legend) { return legends[i].closest('fieldset'); }
+    }
+    return null;
+}
+
+function selectTab() {
+    var candidates = [];
+    if (typeof $telerik !== 'undefined' && $telerik.radControls) {
+        $telerik.radControls.forEach(function (control) {
+            if (!control.get_allTabs) { return; }
+            control.get_allTabs().forEach(function (tab) {
+                candidates.push([tab.get_text(), function () { if (tab.click) { tab.click(); } else { tab.select(); } }]);
+            });
+        });
+    }
+    if (!candidates.length) {
+        document.querySelectorAll('span.rtsTxt').forEach(function (span) {
+            candidates.push([span.textContent, function () { span.click(); }]);
+        });
+    }
+    var texts = candidates.map(function (c) { return (c[0] || '').replace(/\\s+/g, ' ').trim(); });
+    var index = texts.findIndex(function (text) { return text.indexOf(tabText) === 0; });
+    if (index < 0) { index = texts.findIndex(function (text) { return text.indexOf(tabText) >= 0; }); }
+    if (index < 0) { return false; }
+    candidates[index][1]();
+    return true;
+}
+
+function collect() {
+    var sections = {};
+    specs.forEach(function (spec) {
+        var element = findContainer(spec);
+        sections[spec.section] = element ? element.outerHTML : null;
+    });
+    return sections;
+}
+
+var started = Date.now();
+if (tabText && !selectTab()) {
+    done({tab_found: false, ready: false, sections: collect()});
+    return;
+}
+(function poll() {
+    var ready = ajaxIdle() && specs.every(function (spec) { return findContainer(spec); });
+    if (ready || Date.now() - started > timeoutMs) {
+        done({tab_found: true, ready: ready, sections: collect()});
+        return;
+    }
+    setTimeout(poll, 100);
+})();
+"""
+
+
+def capture_tab(driver, tab: str, sections, timeout: float = None) -> dict:
+    """
+    Selects `tab` (None stays on the current one) and returns {section: container outerHTML}
+    for the requested sections, all in one WebDriver round trip instead of a click, a wait
+    and a full page_source. Sections whose container never appeared come back as ''.
+    The first wait is the one learned for this tab; if it overruns, the tab is selected again
+    after a backoff and gets the rest of the `timeout` ceiling.
+    """
+    operation = f"tab:{tab or 'Article'}"
+    ceiling = TAB_READY_TIMEOUTS[tab or "Article"] if timeout is None else timeout
+    timeout = scheduler.timeout(operation, ceiling)
+    specs = [dict(SECTION_CAPTURE[section], section=section) for section in sections]
+    start = time.time()
+    result = driver.execute_async_script(CAPTURE_TAB_SCRIPT, tab, specs, int(timeout * 1000))
+    if result["tab_found"] and not result["ready"] and timeout < ceiling:
+        delay = scheduler.backoff(1)
+        logging.warning(f"⏱️ {tab or 'Current'} tab overran the learned {timeout:.1f}s; selecting it again in {delay:.1f}s")
+        time.sleep(delay)
+        remaining = max(ceiling - (time.time() - start), 1)
+        result = driver.execute_async_script(CAPTURE_TAB_SCRIPT, tab, specs, int(remaining * 1000))
+        timeout = ceiling
+    elapsed = time.time() - start
+    scheduler.observe(operation, elapsed)
+    if not result["tab_found"]:
+        raise RuntimeError(f"{tab} tab not found in the RadTabStrip")
+    label = tab or "Current"
+    if result["ready"]:
+        logging.info(f"⏱️ {label} tab captured in {elapsed:.2f}s (ceiling {timeout:.0f}s)")
+    else:
+        logging.warning(f"⏱️ {label} tab not ready after {elapsed:.2f}s (ceiling {timeout:.0f}s); captured what rendered")
+    return {section: result["sections"].get(section) or '' for section in sections}
+
+
+# ------------------ DOWNLOAD WATCHER ------------------
+# inotify wakes us the moment Chrome renames its .crdownload; without it we poll
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
+DOWNLOAD_POLL_INTERVAL = 0.2
+DOWNLOAD_STABLE_CHECKS = 2
+# Ceiling for one .docx download; the first attempt gets the wait learned from earlier downloads
+DOWNLOAD_TIMEOUT = float(os.getenv("DOWNLOAD_TIMEOUT", 60))
+
+
+def _download_candidates(directory: str, file_name: str, ignore) -> list:
+    """
+    Finished files in `directory` named `file_name` or Chrome's `name (N).ext` duplicate, or
+    with `file_name` None, any finished file: Chrome's partials and hidden temp files excluded.
+    """
+    pattern = None
+    if file_name is not None:
+        stem, ext = os.path.splitext(file_name)
+        pattern = re.compile(rf"^{re.escape(stem)}(?: \(\d+\))?{re.escape(ext)}$", re.IGNORECASE)
+    return [
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name not in ignore and (pattern.match(name) if pattern else not name.startswith("."))
+        and not name.endswith(".crdownload") and os.path.isfile(os.path.join(directory, name))
+        and not os.path.exists(os.path.join(directory, name + ".crdownload"))
+    ]
+
+
+def _downloads_in_flight(directory: str, ignore) -> list:
+    """Chrome's `.crdownload` partials in `directory` that aren't listed in `ignore`."""
+    return [name for name in os.listdir(directory) if name.endswith(".crdownload") and name not in ignore]
+
+
+def _is_size_stable(path: str) -> bool:
+    """True once the file has a non-zero size that stops changing between checks."""
+    try:
+        size = os.path.getsize(path)
+        for _ in range(DOWNLOAD_STABLE_CHECKS):
+            time.sleep(DOWNLOAD_POLL_INTERVAL / 2)
+            if size == 0 or os.path.getsize(path) != size:
+                return False
+    except OSError:
+        return False
+    return True
+
+
+def wait_for_download(directory: str, file_name: str, timeout: float = 60, ignore=()) -> str:
+    """
+    Waits for Chrome to finish saving `file_name` into `directory` and returns the real path,
+    which may carry a ` (1)` duplicate suffix; with `file_name` None, any file will do. Files
+    listed in `ignore` (a snapshot taken before the download started) are skipped. Returns None
+    on timeout.
+    """
+    ignore = set(ignore)
+    deadline = time.time() + timeout
+    watcher = None
+    if INotify is not None:
+        try:
+            watcher = INotify()
+            watcher.add_watch(directory, inotify_flags.MOVED_TO | inotify_flags.CLOSE_WRITE | inotify_flags.CREATE)
+        except OSError as e:
+            logging.warning(f"inotify unavailable, polling for downloads instead: {e}")
+            watcher = None
+    try:
+        while True:
+            for path in _download_candidates(directory, file_name, ignore):
+                if _is_size_stable(path):
+                    return path
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            if watcher is not None:
+                # Wake on the next rename/close in the folder, re-checking at least every second
+                watcher.read(timeout=int(min(remaining, 1) * 1000))
+            else:
+                time.sleep(min(remaining, DOWNLOAD_POLL_INTERVAL))
+    finally:
+        if watcher is not None:
+            watcher.close()
+
+
+# ------------------ HTTP DOWNLOAD ------------------
+# Optional fast path: replay the attachment __doPostBack over plain HTTP instead of
+# clicking it in Chrome and waiting on the download manager.
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+
+POSTBACK_HREF_RE = re.compile(r"__doPostBack\(\s*'([^']*)'\s*,\s*'([^']*)'\s*\)")
+CONTENT_DISPOSITION_RE = re.compile(r"""filename\*?=(?:UTF-8'')?"?([^";]+)"?""", re.IGNORECASE)
+
+
+def is_unedited_docx_link(text: str, href: str, article_id: str) -> bool:
+    """True for the attachment link of the article's unedited .docx postback."""
+    if not text or not href:
+        return False
+    cleaned_text = text.lower().replace(" ", "").replace("_", "")
+    return article_id in cleaned_text and "unedited" in cleaned_text and "docx" in cleaned_text and "javascript:__doPostBack" in href
+
+
+def attachment_signature(page_html: str, article_id: str) -> str:
+    """
+    The text of the unedited .docx row of the attachment grid (file name, size, date), so a
+    repeat run can tell whether the file changed without downloading it. None if not listed.
+    """
+    soup = parse_html(page_html, parse_only=SoupStrainer("div", attrs={"id": "ArticleAttachmentGrid"}))
+    for link in soup.find_all("a", href=True):
+        if is_unedited_docx_link(link.get_text(strip=True), link["href"], article_id):
+            row = link.find_parent("tr")
+            cells = row.find_all("td") if row else [link]
+            return " | ".join(cell.get_text(" ", strip=True) for cell in cells)
+    return None
+
+
+# Returns [text, href] for every link in one WebDriver round trip instead of two calls per element
+ANCHOR_SCAN_SCRIPT = """
+return Array.from(document.querySelectorAll('a[href]'), function (a) {
+    return [(a.innerText || '').trim(), a.getAttribute('href')];
+});
+"""
+ANCHOR_CLICK_SCRIPT = "document.querySelectorAll('a[href]')[arguments[0]].click();"
+
+
+def scan_anchor_links(driver) -> list:
+    """All (text, href) pairs on the current page, indexed the same way click_anchor() expects."""
+    return [(text, href) for text, href in driver.execute_script(ANCHOR_SCAN_SCRIPT)]
+
+
+def click_anchor(driver, index: int):
+    driver.execute_script(ANCHOR_CLICK_SCRIPT, index)
+
+
+def create_http_session(driver):
+    """Builds a pooled keep-alive requests.Session carrying the driver's user agent and cookies."""
+    if requests is None:
+        raise RuntimeError("the HTTP download path needs the 'requests' package")
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = driver.execute_script("return navigator.userAgent;")
+    sync_session_cookies(session, driver)
+    return session
+
+
+def sync_session_cookies(session, driver):
+    """Copies the driver's current cookies into the requests session."""
+    for cookie in driver.get_cookies():
+        session.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/"))
+
+
+def form_fields(form) -> dict:
+    """Serialises an ASP.NET form the way the browser would for a __doPostBack submit."""
+    fields = {}
+    for tag in form.find_all(["input", "select", "textarea"]):
+        name = tag.get("name")
+        if not name or tag.has_attr("disabled"):
+            continue
+        if tag.name == "input":
+            input_type = tag.get("type", "text").lower()
+            if input_type in ("submit", "button", "image", "reset", "file"):
+                continue
+            if input_type in ("checkbox", "radio") and not tag.has_attr("checked"):
+                continue
+            fields[name] = tag.get("value", "on" if input_type in ("checkbox", "radio") else "")
+        elif tag.name == "select":
+            option = tag.find("option", selected=True) or tag.find("option")
+            if option is not None:
+                fields[name] = option.get("value", option.text)
+        else:
+            fields[name] = tag.text
+    return fields
+
+
+def download_via_postback(session, driver, page_html: str, article_id: str, article_dir: str):
+    """
+    Finds the unedited .docx link in the captured page HTML, POSTs its postback with the
+    page's __VIEWSTATE/__EVENTVALIDATION and streams the response into `article_dir`.
+    Returns the saved path, or None so the caller can fall back to the browser.
+    """
+    soup = parse_html(page_html, parse_only=SoupStrainer("form"))
+    form = soup.find("form")
+    if form is None or not form.find("input", attrs={"name": "__VIEWSTATE"}):
+        logging.warning("HTTP download: no ASP.NET form with __VIEWSTATE in captured page")
+        return None
+
+    for link in form.find_all("a", href=True):
+        text = link.get_text(strip=True)
+        if not is_unedited_docx_link(text, link["href"], article_id):
+            continue
+        match = POSTBACK_HREF_RE.search(link["href"])
+        if not match:
+            continue
+
+        fields = form_fields(form)
+        fields["__EVENTTARGET"], fields["__EVENTARGUMENT"] = match.group(1), match.group(2)
+        # The frame's own URL: attachments may live inside an iframe
+        page_url = driver.execute_script("return document.URL;")
+        post_url = requests.compat.urljoin(page_url, form.get("action") or page_url)
+        sync_session_cookies(session, driver)
+        return save_postback_download(session, post_url, fields, page_url, text, article_dir)
+
+    logging.warning(f"HTTP download: no unedited .docx link for {article_id} in captured page")
+    return None
+
+
+def save_postback_download(session, post_url: str, fields: dict, page_url: str, text: str, article_dir: str):
+    """POSTs a file postback and streams the attachment into `article_dir`. Returns the saved path, or None."""
+    try:
+        with session.post(post_url, data=fields, headers={"Referer": page_url}, stream=True, timeout=(10, 60)) as response:
+            response.raise_for_status()
+            if "text/html" in response.headers.get("Content-Type", ""):
+                logging.warning(f"HTTP download: postback for '{text}' returned a page, not a file")
+                return None
+            disposition = CONTENT_DISPOSITION_RE.search(response.headers.get("Content-Disposition", ""))
+            file_name = os.path.basename(requests.utils.unquote(disposition.group(1))) if disposition else text
+            destination_path = os.path.join(article_dir, file_name)
+            partial_path = destination_path + ".part"
+            with open(partial_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+            os.replace(partial_path, destination_path)
+    except requests.RequestException as e:
+        logging.warning(f"HTTP download: postback for '{text}' failed: {e}")
+        return None
+
+    print(f"✅ File downloaded over HTTP to: {destination_path}")
+    return destination_path
+
+
+def download_unedited_docx(driver, page_html: str, article_id: str, article_dir: str,
+                           browser_download_dir: str, http_session=None) -> bool:
+    """
+    Downloads the article's unedited .docx from the open Attachments tab into `article_dir`.
+    `article_id` is the normalised id used for filename matching.
+    """
+    # Initialize tracking variables
+    file_downloaded = False
+    matched_file = None
+    # The folder before the first click: a late copy from any attempt completes the download
+    existing_files = None
+
+    if http_session is not None:
+        file_downloaded = download_via_postback(http_session, driver, page_html, article_id, article_dir) is not None
+
+    print("🔍 Scanning for links with JavaScript postback...")
+
+    MAX_RETRIES = 3
+
+    for attempt in range(1, MAX_RETRIES + 1):
+        if file_downloaded:
+            break
+        try:
+            for index, (text, href) in enumerate(scan_anchor_links(driver)):
+                if is_unedited_docx_link(text, href, article_id):
+                    print(f"✅ Attempt {attempt}: Found match '{text}' triggering download...")
+                    matched_file = text
+
+                    # Trigger postback download, unless an earlier click's download is still being saved:
+                    # clicking again would leave a " (1)" copy behind in the worker's download folder
+                    if existing_files is None:
+                        existing_files = os.listdir(browser_download_dir)
+                        click_anchor(driver, index)
+                    elif _downloads_in_flight(browser_download_dir, existing_files):
+                        print(f"⏳ Attempt {attempt}: the previous download is still in progress; waiting for it")
+                    else:
+                        click_anchor(driver, index)
+
+                    # Monitor download. Chrome names the file after the Content-Disposition header, which
+                    # needn't match the link text: in this browser's own folder, any new file is the download
+                    timeout = scheduler.timeout("docx_download", DOWNLOAD_TIMEOUT) if attempt == 1 else DOWNLOAD_TIMEOUT
+                    started = time.perf_counter()
+                    downloaded_file_path = wait_for_download(browser_download_dir, None, timeout, existing_files)
+                    scheduler.observe("docx_download", time.perf_counter() - started)
+
+                    if downloaded_file_path is None:
+                        print(f"⚠️ Timeout: File '{matched_file}' not found after {timeout:.0f} seconds.")
+                    else:
+                        destination_path = os.path.join(article_dir, os.path.basename(downloaded_file_path))
+                        shutil.move(downloaded_file_path, destination_path)
+                        # A re-click's copy that finished too is a duplicate of the one just moved
+                        for duplicate in _download_candidates(browser_download_dir, None, existing_files):
+                            os.remove(duplicate)
+                        file_downloaded = True
+                        print(f"✅ File successfully downloaded and moved to: {destination_path}")
+                    break  # break out of tag loop
+            if file_downloaded:
+                break  # stop retrying if success
+            else:
+                print(f"🔁 Retry {attempt} failed. Trying again...")
+                scheduler.sleep_before_retry(attempt)
+        except StaleElementReferenceException:
+            print(f"⚠️ Retry {attempt}: StaleElementReferenceException encountered.")
+            scheduler.sleep_before_retry(attempt)
+        except Exception as e:
+            if browser_died(e):
+                raise
+            print(f"⚠️ Retry {attempt}: Error while scanning postback links: {e}")
+            scheduler.sleep_before_retry(attempt)
+
+    # Final status
+    if not file_downloaded:
+        print(f"❌ Failed to download unedited file for article {article_id} after {MAX_RETRIES} retries.")
+    else:
+        print(f"✅ Finished downloading for article: {article_id}")
+    return file_downloaded
+
+
+def process_article(driver, article: dict, download_dir: str, browser_download_dir: str = None,
+                    http_session=None, ledger=None, capture_dir: str = None, session=None, section_cache=None,
+                    refresh: bool = False, pipeline=None, http_scraper=None):
+    """
+    Scrapes one article's tabs, downloads its unedited .docx and writes the merged report.
+    `browser_download_dir` is where this driver's Chrome saves files (defaults to download_dir).
+    With an `http_session` the .docx is fetched by replaying the postback over HTTP first.
+    With a `ledger`, stages finished by an earlier run are reused instead of redone.
+    With a `capture_dir`, the raw page of every tab is saved as a replayable snapshot.
+    With a `session` manager, a stage bounced to login.aspx is re-authenticated and retried.
+    With a `section_cache`, the extracted sections are kept so the report can be re-rendered offline.
+    With `refresh`, an already processed article has its tabs read again, but the .docx is only
+    downloaded again when its attachment row changed and the report is only rewritten when a
+    section's fingerprint changed.
+    With an extraction `pipeline`, pages are parsed in its process pool and the article is finished
+    (ledger, merge, cache) on its background thread, so this returns as soon as the browser is done.
+    With an `http_scraper`, tabs are read by replaying their partial postbacks over HTTP; the browser
+    only loads the article for tabs (or the .docx) that couldn't be replayed.
+    Returns False when a portal stage (a tab or the .docx) failed, for the circuit breaker.
+    """
+    if browser_download_dir is None:
+        browser_download_dir = download_dir
+
+    jid, aid = article["jid"], article["aid"]
+    article_id = f"{jid}{aid}"
+    print(f"✅ Processing article: {article_id}")
+    article_start = time.perf_counter()
+
+    done = ledger.completed_stages(jid, aid) if ledger is not None else {}
+    extracted_parts = {key: done.get(key) or '' for key in SECTION_KEYS}
+    captured_pages = {}
+    if refresh:
+        previous_parts = (section_cache.get(jid, aid) if section_cache is not None else None) or dict(extracted_parts)
+        # Every tab is read again; the .docx stage keeps its attachment row signature for comparison
+        done = {stage: output for stage, output in done.items() if stage == "docx"}
+
+    def record(stage, output=None, error=None):
+        if ledger is not None:
+            ledger.mark(jid, aid, stage, STAGE_FAILED if error else STAGE_DONE, output, error)
+
+    parsing = {}  # section -> pending parse in the pipeline's process pool
+    portal_ok = True
+
+    def extract(section, page_html, filename):
+        if pipeline is not None:
+            parsing[section] = pipeline.extract(page_html, filename, section, article)
+            return
+        with timings.stage(f"parse:{section}", article_id):
+            processed_html = simplified_html(page_html, filename, section, article)
+        extracted_parts[section] = processed_html.get(section, '')
+        record(section, extracted_parts[section])
+
+    article_dir = os.path.join(download_dir, article_id)
+    os.makedirs(article_dir, exist_ok=True)
+
+    # Construct normalized article ID (used for filename matching and the merged report)
+    normalized_id = report_id(article_id)
+
+    article_url = smart_url(f"MaintainArticle.aspx?articleid={aid}")
+
+    def load_article_page():
+        load_page(driver, article_url)
+        wait_for_tab_ready(driver, "Article")
+
+    browser_frame = None  # None until the browser has the article open, then "page" or "iframe"
+    http_page_open = False
+
+    def open_in_browser():
+        nonlocal browser_frame
+        # After login, navigate to the desired article page
+        with timings.stage("page_load", article_id):
+            run_stage(driver, session, load_article_page)
+        browser_frame = "page"
+
+    def reopen_article():
+        # A re-login left the article: loading it again puts the driver back on the top document
+        nonlocal browser_frame
+        load_article_page()
+        browser_frame = "page"
+
+    def enter_iframe():
+        nonlocal browser_frame
+        if browser_frame == "page":
+            try:
+                iframe = WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.TAG_NAME, "iframe"))
+                )
+                driver.switch_to.frame(iframe)
+                print("Switched to iframe.")
+            except Exception as e:
+                if browser_died(e):
+                    raise
+                print("No iframe detected, proceeding normally.")
+            browser_frame = "iframe"
+
+    def browser_capture(tab, sections, timeout=None):
+        """capture_tab() in the browser, opening the article and entering its iframe when needed."""
+        nonlocal browser_frame
+        if browser_frame is None:
+            open_in_browser()
+        if tab is None:
+            if browser_frame == "iframe":
+                driver.switch_to.default_content()
+                browser_frame = "page"
+            return capture_tab(driver, None, sections)
+
+        def stage():
+            # Entered inside the stage, so the retry after a re-login finds the iframe of the reloaded page
+            enter_iframe()
+            return capture_tab(driver, tab, sections, timeout)
+
+        return run_stage(driver, session, stage, reopen_article)
+
+    def capture(tab, sections, timeout=None):
+        """Reads a tab over HTTP when its postback can be replayed, otherwise in the browser."""
+        if http_page_open:
+            pages = http_scraper.capture(tab, sections)
+            if pages is not None:
+                return pages
+            logging.warning(f"🌐 {tab or 'Article'} tab of {article_id} couldn't be replayed over HTTP; using the browser")
+        return browser_capture(tab, sections, timeout)
+
+    if refresh or any(stage not in done for stage in SECTION_KEYS + ["docx"]):
+        if http_scraper is not None:
+            with timings.stage("page_load", article_id):
+                http_page_open = http_scraper.open_article(aid)
+        if not http_page_open:
+            open_in_browser()
+        record("page_loaded")
+
+        # Extract and simplify HTML
+        if "article_info" not in done:
+            page_html = capture(None, ["article_info"])["article_info"]
+            captured_pages["article_info"] = page_html
+            extract("article_info", page_html, f"{article_id}.html")
+
+        # Navigate to the Attachments tab of the desired article page
+        if "Attachments" not in done or "docx" not in done:
+            with timings.stage("tab:Attachments", article_id):
+                page_html = capture("Attachments", ["Attachments"], timeout=30)["Attachments"]
+            print("✅ Successfully loaded Attachments page.")
+            captured_pages["Attachments"] = page_html
+            if "Attachments" not in done:
+                extract("Attachments", page_html, f"{article_id}_Attachments.html")
+
+            if "docx" not in done or refresh:
+                signature = attachment_signature(page_html, normalized_id)
+                have_docx = any(name.lower().endswith(".docx") for name in os.listdir(article_dir))
+                if refresh and have_docx and signature is not None and signature == done.get("docx"):
+                    print(f"🧹 Unedited .docx unchanged for article {article_id}; not downloading it again")
+                else:
+                    with timings.stage("docx_download", article_id):
+                        file_downloaded = http_page_open and http_scraper.download_docx(normalized_id, article_dir) is not None
+                        if not file_downloaded:
+                            if http_page_open:
+                                # The browser has to be on the Attachments tab to click the link
+                                browser_capture("Attachments", ["Attachments"], timeout=30)
+                            # Replaying the postback over HTTP needs the whole form with its view state
+                            form_html = driver.page_source if http_session is not None else page_html
+                            file_downloaded = download_unedited_docx(driver, form_html, normalized_id, article_dir,
+                                                                     browser_download_dir, http_session)
+                    if file_downloaded:
+                        record("docx", signature)
+                    else:
+                        record("docx", error="unedited .docx not downloaded")
+                        # An Attachments tab without the link is missing content; a listed one that didn't download is the portal
+                        if signature is not None:
+                            portal_ok = False
+
+        # Guidelines, Authors, Problems/Notes and Comments tabs
+        for tab, section, suffix in SECTION_TABS:
+            if section in done:
+                continue
+            try:
+                with timings.stage(f"tab:{tab}", article_id):
+                    page_html = capture(tab, [section])[section]
+                captured_pages[section] = page_html
+                extract(section, page_html, f"{article_id}{suffix}.html")
+            except Exception as e:
+                # A dead browser goes up to process_with_recovery, which respawns it and resumes the article
+                if browser_died(e):
+                    raise
+                logging.warning(f"⚠️ Error capturing {tab} for article {aid}: {e}")
+                record(section, error=str(e))
+                if portal_failed(e):
+                    portal_ok = False
+
+    def finish():
+        for section, pending in parsing.items():
+            try:
+                processed_html, seconds = pending.result()
+            except Exception as e:
+                logging.warning(f"⚠️ Error extracting {section} for article {aid}: {e}")
+                record(section, error=str(e))
+                continue
+            timings.record(f"parse:{section}", article_id, seconds)
+            extracted_parts[section] = processed_html.get(section, '')
+            record(section, extracted_parts[section])
+
+        if capture_dir and captured_pages:
+            save_page_snapshot(capture_dir, article, captured_pages)
+
+        if refresh:
+            changed = [key for key in SECTION_KEYS
+                       if section_fingerprint(extracted_parts[key]) != section_fingerprint(previous_parts.get(key) or '')]
+            if not changed and find_merged_report(download_dir, normalized_id):
+                print(f"🧹 No changes for article {article_id}; keeping its merged report")
+                record("merged")
+                timings.record("article", article_id, time.perf_counter() - article_start)
+                return
+            print(f"🔄 Changed sections for article {article_id}: {', '.join(changed) or 'none (report missing)'}")
+
+        # Merge the simplified HTML files
+        with timings.stage("merge", article_id):
+            merge_simplified_html(normalized_id, article, extracted_parts, download_dir)
+        if section_cache is not None:
+            section_cache.mark_rendered(jid, aid, section_cache.put(jid, aid, extracted_parts))
+        record("merged")
+        timings.record("article", article_id, time.perf_counter() - article_start)
+
+    if pipeline is not None:
+        pipeline.finish(finish, article_id)
+    else:
+        finish()
+    return portal_ok
+
+
+def process_with_recovery(driver, article: dict, *args, **kwargs):
+    """
+    process_article() behind the circuit breaker. If the browser dies mid-article it is respawned
+    and the article resumed, the ledger skipping its finished stages. Returns whether the portal
+    answered: True, False, or None when the article failed for a reason of its own.
+    """
+    trial = scheduler.before_article()
+    try:
+        try:
+            portal_ok = process_article(driver, article, *args, **kwargs)
+        except Exception as e:
+            if not (isinstance(driver, ManagedDriver) and browser_died(e)):
+                raise
+            driver.respawn(e)
+            portal_ok = process_article(driver, article, *args, **kwargs)
+    except Exception as e:
+        logging.error(f"Failed to process article {article['jid']}{article['aid']}: {e}")
+        # Only the portal not answering counts toward the breaker, not a bug in this article's handling
+        portal_ok = False if portal_failed(e) else None
+    scheduler.after_article(portal_ok, trial)
+    if isinstance(driver, ManagedDriver):
+        driver.article_done()
+    return portal_ok
+
+
+def run_worker(worker_id: int, article_queue: queue.Queue, download_dir: str, http_download: bool = False, ledger=None,
+               capture_dir: str = None, session=None, section_cache=None, refresh: bool = False, pipeline=None,
+               http_scrape: bool = False):
+    """
+    Runs one headless browser that processes articles from the shared queue until it gets None.
+    With `http_scrape`, tabs are read over HTTP and the browser only starts if one can't be.
+    """
+    # Each worker gets its own Chrome download folder so concurrent .docx downloads can't collide
+    worker_download_dir = os.path.join(download_dir, f".worker-{worker_id}")
+    os.makedirs(worker_download_dir, exist_ok=True)
+    if session is None:
+        session = SessionManager(os.getenv("login_id"), os.getenv("login_pwd"))
+        session.load()
+    worker_driver = ManagedDriver(worker_download_dir, session, headless=True)
+    try:
+        http_session = create_http_session(worker_driver) if http_download and not http_scrape else None
+        http_scraper = None
+        if http_scrape:
+            from http_scraper import HttpScraper
+            http_scraper = HttpScraper(session)
+        while True:
+            article = article_queue.get()
+            if article is None:
+                break
+            process_with_recovery(worker_driver, article, download_dir, worker_download_dir, http_session, ledger,
+                                  capture_dir, session, section_cache, refresh, pipeline, http_scraper)
+    finally:
+        worker_driver.quit()
+
+
+# ------------------ INTAKE ------------------
+JID_RE = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def read_article_rows(source: str, input_format: str = None):
+    """
+    Streams (line number, row) pairs from a CSV or JSONL work list, or from stdin when
+    `source` is '-'. The format defaults to JSONL for .jsonl/.ndjson files, CSV otherwise.
+    """
+    if input_format is None:
+        input_format = "jsonl" if source.endswith((".jsonl", ".ndjson")) else "csv"
+    stream = sys.stdin if source == "-" else open(source, mode='r', encoding='utf-8', newline='')
+    try:
+        if input_format == "jsonl":
+            for line_no, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as e:
+                    logging.warning(f"Skipping unreadable line {line_no}: {e}")
+        else:
+            reader = csv.DictReader(stream)
+            for row in reader:
+                yield reader.line_num, row
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def validate_articles(rows):
+    """Turns raw rows into article dicts, skipping malformed rows and repeated JID+AID pairs."""
+    seen = set()
+    for line_no, row in rows:
+        if not isinstance(row, dict):
+            logging.warning(f"Skipping malformed row {line_no}: {row!r}")
+            continue
+        jid = str(row.get("JID") or row.get("jid") or "").strip()
+        aid = str(row.get("AID") or row.get("aid") or "").strip()
+        # isdigit() alone lets "²" or "①" through to int(), which would end the whole intake
+        if not JID_RE.match(jid) or not (aid.isascii() and aid.isdecimal()):
+            logging.warning(f"Skipping malformed row {line_no}: JID={jid!r} AID={aid!r}")
+            continue
+        key = (jid.lower(), int(aid))
+        if key in seen:
+            logging.info(f"Skipping duplicate article {jid}{aid} on row {line_no}")
+            continue
+        seen.add(key)
+        yield {"jid": jid, "aid": int(aid)}
+
+
+def order_by_jid(articles, chunk_size: int, priority_jids=()):
+    """
+    Groups articles by JID, listed `priority_jids` first, within consecutive chunks of
+    `chunk_size` so ordering never needs the whole work list in memory.
+    """
+    priority = {jid.lower(): rank for rank, jid in enumerate(priority_jids)}
+
+    def sort_key(article):
+        jid = article["jid"].lower()
+        return priority.get(jid, len(priority)), jid
+
+    chunk = []
+    for article in articles:
+        chunk.append(article)
+        if len(chunk) >= chunk_size:
+            yield from sorted(chunk, key=sort_key)
+            chunk = []
+    yield from sorted(chunk, key=sort_key)
+
+
+def pending_articles(articles, ledger=None, refresh: bool = False):
+    """Skips articles whose every stage finished in an earlier run, unless checking them for changes."""
+    for article in articles:
+        if not refresh and ledger is not None and ledger.is_complete(article["jid"], article["aid"]):
+            print(f"🧹 Skipping already processed article: {article['jid']}{article['aid']}")
+            continue
+        yield article
+
+
+def feed_articles(articles, article_queue: queue.Queue, consumers: int, ledger=None, refresh: bool = False):
+    """Producer: puts pending articles on the bounded queue, then one None per consumer."""
+    try:
+        for article in pending_articles(articles, ledger, refresh):
+            article_queue.put(article)
+    except Exception as e:
+        logging.error(f"Article intake stopped: {e}")
+    finally:
+        for _ in range(consumers):
+            article_queue.put(None)
+
+
+def run_fetch(args):
+    """Logs in, then downloads and merges every article of the work list. Starts Chrome."""
+    global SMART_BASE_URL, PAGE_LOAD_STRATEGY, LEAN_BROWSER, RECYCLE_AFTER_ARTICLES, MAX_BROWSER_RSS_MB
+    SMART_BASE_URL = args.base_url.rstrip("/") + "/"
+    PAGE_LOAD_STRATEGY = args.page_load_strategy
+    LEAN_BROWSER = args.lean_browser
+    RECYCLE_AFTER_ARTICLES = args.recycle_after
+    MAX_BROWSER_RSS_MB = args.max_browser_rss
+    scheduler.adaptive = not args.fixed_timeouts
+    scheduler.breaker_threshold = args.breaker_threshold
+    scheduler.breaker_cooldown = args.breaker_cooldown
+    if args.engine == "cdp" and (args.refresh or args.http_download or args.workers > 1):
+        raise SystemExit("--engine cdp runs its tabs in one browser and doesn't support --refresh, --http-download or --workers")
+    http_scrape = args.engine == "http"
+    if http_scrape and requests is None:
+        raise SystemExit("--engine http needs the 'requests' package")
+
+    # Create a directory for downloads
+    download_dir = os.path.abspath(args.download_dir)
+    os.makedirs(download_dir, exist_ok=True)
+
+    # Chrome starts on first use: over HTTP, only if login or some tab needs it. Like each worker's,
+    # its download folder holds nothing else, so whatever appears there is the .docx it was asked for
+    browser_download_dir = os.path.join(download_dir, ".browser")
+    os.makedirs(browser_download_dir, exist_ok=True)
+    driver = ManagedDriver(browser_download_dir)
+    pipeline = ExtractionPipeline(args.parse_processes) if args.parse_processes != 0 else None
+    session = ledger = section_cache = None
+    try:
+        # **Login**
+        load_dotenv()
+        login_id = os.getenv("login_id")
+        login_pwd = os.getenv("login_pwd")
+        session = SessionManager(login_id, login_pwd)
+        driver.session = session
+        with timings.stage("login"):
+            # Over HTTP, live saved cookies or an HTTP login spare the browser login
+            if not (http_scrape and ((session.load() and session.is_alive()) or session.login_http())):
+                login(driver, login_id, login_pwd, session)
+        session.start_refresher()
+        http_session = create_http_session(driver) if args.http_download and not http_scrape else None
+        http_scraper = None
+        if http_scrape:
+            from http_scraper import HttpScraper
+            http_scraper = HttpScraper(session)
+        ledger = JobLedger(args.ledger or os.path.join(download_dir, "jobs.sqlite3"))
+        section_cache = SectionCache(args.section_cache or os.path.join(download_dir, "sections.sqlite3"))
+
+        # Stream, validate and de-duplicate the work list into a bounded queue
+        articles = validate_articles(read_article_rows(args.input, args.input_format))
+        if args.group_by_jid or args.priority_jids:
+            priority_jids = [jid.strip() for jid in (args.priority_jids or "").split(",") if jid.strip()]
+            articles = order_by_jid(articles, args.chunk_size, priority_jids)
+
+        if args.engine == "cdp":
+            # Many tabs of this one authenticated Chrome, driven over DevTools from one event loop
+            from cdp_engine import CdpEngine
+            engine = CdpEngine(driver, download_dir, args.tabs, session, ledger, section_cache, args.capture_dir, pipeline)
+            asyncio.run(engine.run(pending_articles(articles, ledger)))
+            return
+
+        article_queue = queue.Queue(maxsize=args.queue_size)
+        consumers = max(args.workers, 1)
+        producer = threading.Thread(target=feed_articles, args=(articles, article_queue, consumers, ledger, args.refresh),
+                                    daemon=True)
+        producer.start()
+
+        # Worker-pool mode: extra headless browsers share the session cookies saved by login()
+        workers = [
+            threading.Thread(target=run_worker, args=(n, article_queue, download_dir, args.http_download, ledger, args.capture_dir, session,
+                                                       section_cache, args.refresh, pipeline, http_scrape),
+                             daemon=True)
+            for n in range(1, args.workers + 1)
+        ] if args.workers > 1 else []
+        for worker in workers:
+            worker.start()
+
+        if workers:
+            for worker in workers:
+                worker.join()
+        else:
+            while True:
+                article = article_queue.get()
+                if article is None:
+                    break
+                process_with_recovery(driver, article, download_dir, browser_download_dir, http_session=http_session, ledger=ledger,
+                                      capture_dir=args.capture_dir, session=session, section_cache=section_cache,
+                                      refresh=args.refresh, pipeline=pipeline, http_scraper=http_scraper)
+    finally:
+        # Articles still being finished by the pipeline record into the ledger and the cache: drain it first
+        if pipeline is not None:
+            pipeline.close()
+        if session is not None:
+            session.stop()
+        if ledger is not None:
+            ledger.close()
+        if section_cache is not None:
+            section_cache.close()
+        timings.export(args.timings_dir or download_dir, args.prometheus_textfile)
+        for operation, seconds in scheduler.summary().items():
+            logging.info(f"⏱️ learned timeout for {operation}: {seconds:.1f}s")
+        # Close the browser
+        driver.quit()
@@ -0,0 +1,277 @@
+"""
+Reads article tabs without a browser. MaintainArticle.aspx is fetched over a pooled keep-alive
+HTTP session carrying the portal cookies, and each RadTabStrip tab is switched by replaying its
+ASP.NET AJAX partial postback; the |updatePanel| delta that comes back holds the same containers
+the browser would have rendered. A tab that can't be replayed returns None so the caller can
+fall back to the browser.
+"""
+import json
+import logging
+import re
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import fetch
+from merge import parse_html
+from scheduler import scheduler
+
+HTTP_CONNECT_TIMEOUT = 10
+# Ceiling for a response; the scheduler learns a shorter one from the run's responses
+HTTP_READ_TIMEOUT = 60
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+DEFAULT_SCRIPT_MANAGER = "ctl00$ScriptManager1"
+
+# Sys.WebForms.PageRequestManager._initialize('<script manager>', '<form>', ['t<panel name>', ...], [<client ids>], ...)
+PRM_INITIALIZE_RE = re.compile(r"PageRequestManager\._initialize\(\s*'([^']+)'\s*,\s*'[^']*'\s*,\s*\[([^\]]*)\]\s*,\s*\[([^\]]*)\]")
+POSTBACK_CALL_RE = re.compile(r"__doPostBack\(\s*'([^']*)'\s*,\s*'([^']*)'\s*\)")
+
+
+def parse_delta(text: str) -> list:
+    """
+    Splits an ASP.NET AJAX partial-postback response (length|type|id|content| repeated) into
+    (type, id, content) entries. Raises ValueError when the text isn't a delta.
+    """
+    entries, pos = [], 0
+    while pos < len(text):
+        length_end = text.index("|", pos)
+        length = int(text[pos:length_end])
+        type_end = text.index("|", length_end + 1)
+        id_end = text.index("|", type_end + 1)
+        content = text[id_end + 1:id_end + 1 + length]
+        if text[id_end + 1 + length:id_end + 2 + length] != "|":
+            raise ValueError(f"malformed delta entry at offset {pos}")
+        entries.append((text[length_end + 1:type_end], text[type_end + 1:id_end], content))
+        pos = id_end + 2 + length
+    return entries
+
+
+def find_container(soup, section: str):
+    """The element holding `section`, located the same way CAPTURE_TAB_SCRIPT does in the browser."""
+    spec = fetch.SECTION_CAPTURE[section]
+    if "id" in spec:
+        return soup.find(id=spec["id"])
+    for legend in soup.select("fieldset legend"):
+        if legend.get_text(strip=True) == spec["legend"]:
+            return legend.find_parent("fieldset")
+    return None
+
+
+def match_tab(labels: list, tab: str) -> int:
+    """Index of the tab whose label starts with `tab` (else contains it), -1 if none does."""
+    for index, label in enumerate(labels):
+        if label.startswith(tab):
+            return index
+    for index, label in enumerate(labels):
+        if tab in label:
+            return index
+    return -1
+
+
+class HttpScraper:
+    """
+    One article page at a time, over one pooled requests.Session. open_article() loads the page
+    (and the iframe holding the tabs, if any); capture() then replays tab switches on its form.
+    Not thread-safe: every worker gets its own.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.http.mount("https://", adapter)
+        self.http.mount("http://", adapter)
+        self.http.headers["User-Agent"] = USER_AGENT
+        self._cookie_version = None
+        self.article_html = None
+        self.page_url = None
+        self.post_url = None
+        self.fields = {}
+        self.tabs = []  # [(label, target, argument)] of the RadTabStrip
+        self.script_manager = DEFAULT_SCRIPT_MANAGER
+        self.panel = None
+        self.current_tab = None
+        self.current_soup = None
+
+    # -------- session --------
+    def _sync_cookies(self):
+        if self._cookie_version == self.session.version:
+            return
+        # Version first: cookies swapped in meanwhile only cause one more sync next time
+        self._cookie_version = self.session.version
+        for cookie in list(self.session.cookies):
+            self.http.cookies.set(cookie["name"], cookie["value"], domain=cookie.get("domain"), path=cookie.get("path", "/"))
+
+    def _reauthenticate(self) -> bool:
+        """Picks up cookies another thread refreshed, or logs in over HTTP. False if neither worked."""
+        if self._cookie_version == self.session.version and not self.session.login_http():
+            return False
+        self._sync_cookies()
+        return True
+
+    def _timeout(self) -> tuple:
+        return HTTP_CONNECT_TIMEOUT, scheduler.timeout("http", HTTP_READ_TIMEOUT)
+
+    def _get(self, url: str):
+        """GETs a portal page, logging in again once if it bounces to login.aspx. None on failure."""
+        for attempt in range(2):
+            self._sync_cookies()
+            try:
+                response = self.http.get(url, timeout=self._timeout())
+                response.raise_for_status()
+                scheduler.observe("http", response.elapsed.total_seconds())
+            except requests.RequestException as e:
+                logging.warning(f"HTTP: GET {url} failed: {e}")
+                return None
+            if "login.aspx" not in response.url.lower():
+                return response
+            if attempt or not self._reauthenticate():
+                return None
+        return None
+
+    # -------- page state --------
+    def open_article(self, aid: int) -> bool:
+        """Loads the article page and the form its tabs post back to. False if the tabs can't be replayed."""
+        self.current_tab = self.current_soup = None
+        response = self._get(fetch.smart_url(f"MaintainArticle.aspx?articleid={aid}"))
+        if response is None:
+            return False
+        self.article_html = response.text
+        soup = parse_html(response.text)
+        # The tabs may live in an iframe of the article page, as the browser path expects
+        iframe = soup.find("iframe", src=True)
+        if iframe is not None:
+            response = self._get(requests.compat.urljoin(response.url, iframe["src"]))
+            if response is None:
+                return False
+            soup = parse_html(response.text)
+        return self._load_form(response.url, response.text, soup)
+
+    def _load_form(self, page_url: str, page_html: str, soup) -> bool:
+        form = soup.find("form")
+        strip = soup.find("div", class_="RadTabStrip")
+        if form is None or strip is None or not form.find("input", attrs={"name": "__VIEWSTATE"}):
+            logging.warning("HTTP: no ASP.NET form with a RadTabStrip and __VIEWSTATE on the article page")
+            return False
+        self.page_url = page_url
+        self.post_url = requests.compat.urljoin(page_url, form.get("action") or page_url)
+        self.fields = fetch.form_fields(form)
+
+        # Each tab header's own postback, else the RadTabStrip's {"type":0,"index":n} convention
+        strip_name = strip["id"].replace("_", "$")
+        self.tabs = []
+        for index, span in enumerate(strip.select("span.rtsTxt")):
+            link = span.find_parent("a")
+            handler = " ".join(link.get(attr, "") for attr in ("onclick", "href")) if link is not None else ""
+            call = POSTBACK_CALL_RE.search(handler)
+            target, argument = call.groups() if call else (strip_name, json.dumps({"type": 0, "index": str(index)}))
+            self.tabs.append((" ".join(span.get_text().split()), target, argument))
+
+        # The update panel around the tab strip is the one to ask the server to re-render
+        self.script_manager, self.panel = DEFAULT_SCRIPT_MANAGER, None
+        initialize = PRM_INITIALIZE_RE.search(page_html)
+        panels = {}
+        if initialize:
+            self.script_manager = initialize.group(1)
+            names = re.findall(r"'([^']*)'", initialize.group(2))
+            client_ids = re.findall(r"'([^']*)'", initialize.group(3))
+            panels = {client_id: name[1:] for name, client_id in zip(names, client_ids)}
+        for parent in strip.find_parents("div", id=True):
+            if not panels or parent["id"] in panels:
+                self.panel = panels.get(parent["id"], parent["id"].replace("_", "$"))
+                break
+        if self.panel is None:
+            self.panel = strip_name
+        self.current_soup = soup
+        return True
+
+    # -------- tabs --------
+    def capture(self, tab: str, sections) -> dict:
+        """
+        {section: container HTML} for `tab` (None: the article page itself), like capture_tab().
+        None when the tab can't be replayed or any container is missing, so the browser can take over.
+        """
+        if tab is None:
+            soup = parse_html(self.article_html)
+        else:
+            soup = self._select_tab(tab)
+            if soup is None:
+                return None
+        pages = {}
+        for section in sections:
+            container = find_container(soup, section)
+            if container is None:
+                logging.warning(f"HTTP: {section} container missing from the {tab or 'Article'} tab response")
+                return None
+            pages[section] = str(container)
+        return pages
+
+    def _select_tab(self, tab: str):
+        index = match_tab([label for label, _, _ in self.tabs], tab)
+        if index < 0:
+            logging.warning(f"HTTP: {tab} tab not found in the RadTabStrip")
+            return None
+        _, target, argument = self.tabs[index]
+        fields = dict(self.fields, __EVENTTARGET=target, __EVENTARGUMENT=argument, __ASYNCPOST="true")
+        fields[self.script_manager] = f"{self.panel}|{target}"
+        headers = {"X-MicrosoftAjax": "Delta=true", "X-Requested-With": "XMLHttpRequest", "Referer": self.page_url}
+        self._sync_cookies()
+        try:
+            response = self.http.post(self.post_url, data=fields, headers=headers, timeout=self._timeout())
+            response.raise_for_status()
+            scheduler.observe("http", response.elapsed.total_seconds())
+        except requests.RequestException as e:
+            logging.warning(f"HTTP: {tab} tab postback failed: {e}")
+            return None
+
+        if "text/html" in response.headers.get("Content-Type", ""):
+            # A full render instead of a delta still carries the tab, and the new form state
+            if "login.aspx" in response.url.lower():
+                return None
+            soup = parse_html(response.text)
+            if not self._load_form(response.url, response.text, soup):
+                return None
+        else:
+            try:
+                entries = parse_delta(response.text)
+            except ValueError as e:
+                logging.warning(f"HTTP: unreadable {tab} tab delta: {e}")
+                return None
+            panels = []
+            for entry_type, entry_id, content in entries:
+                if entry_type == "updatePanel":
+                    panels.append(content)
+                elif entry_type == "hiddenField":
+                    self.fields[entry_id] = content
+                elif entry_type in ("pageRedirect", "error"):
+                    logging.warning(f"HTTP: {tab} tab postback answered with {entry_type} {requests.utils.unquote(content)!r}")
+                    if "login.aspx" in content.lower():
+                        self._reauthenticate()
+                    return None
+            if not panels:
+                return None
+            soup = parse_html("".join(panels))
+        self.current_tab, self.current_soup = tab, soup
+        return soup
+
+    # -------- attachments --------
+    def download_docx(self, article_id: str, article_dir: str):
+        """
+        Posts the unedited .docx link of the Attachments tab last captured, with the form state
+        that came with it. Returns the saved path, or None so the caller can use the browser.
+        """
+        if self.current_tab != "Attachments":
+            return None
+        for link in self.current_soup.find_all("a", href=True):
+            text = link.get_text(strip=True)
+            if not fetch.is_unedited_docx_link(text, link["href"], article_id):
+                continue
+            match = POSTBACK_CALL_RE.search(link["href"])
+            if not match:
+                continue
+            fields = dict(self.fields, __EVENTTARGET=match.group(1), __EVENTARGUMENT=match.group(2))
+            self._sync_cookies()
+            return fetch.save_postback_download(self.http, self.post_url, fields, self.page_url, text, article_dir)
+        logging.warning(f"HTTP: no unedited .docx link for {article_id} in the Attachments tab")
+        return None
@@ -0,0 +1,94 @@
+"""Per-stage timing of the pipeline and the end-of-run summary export."""
+import os
+import csv
+import json
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+class StageTimer:
+    """
+    Collects how long each pipeline stage took for each article and summarises
+    them as count/p50/p95/max per stage at the end of the run. Thread-safe.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = []  # (article_id, stage, seconds)
+
+    def record(self, stage: str, article_id: str, seconds: float):
+        with self._lock:
+            self.records.append((article_id, stage, seconds))
+
+    @contextmanager
+    def stage(self, stage: str, article_id: str = None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, article_id, time.perf_counter() - start)
+
+    def summary(self) -> dict:
+        """Stage name -> {count, total, p50, p95, max} in seconds."""
+        with self._lock:
+            by_stage = {}
+            for _, stage, seconds in self.records:
+                by_stage.setdefault(stage, []).append(seconds)
+        return {
+            stage: {
+                "count": len(values),
+                "total": round(sum(values), 6),
+                "p50": round(percentile(values, 50), 6),
+                "p95": round(percentile(values, 95), 6),
+                "max": round(max(values), 6),
+            }
+            for stage, values in by_stage.items()
+        }
+
+    def export(self, output_dir: str, prometheus_path: str = None):
+        """
+        Writes run_timings.csv (one row per article and stage) and run_summary.json into
+        `output_dir`, logs the summary, and optionally writes a Prometheus textfile.
+        """
+        summary = self.summary()
+        os.makedirs(output_dir, exist_ok=True)
+        with self._lock:
+            records = list(self.records)
+        with open(os.path.join(output_dir, "run_timings.csv"), "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["article_id", "stage", "seconds"])
+            for article_id, stage, seconds in records:
+                writer.writerow([article_id or "", stage, f"{seconds:.3f}"])
+        with open(os.path.join(output_dir, "run_summary.json"), "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+        for stage, stats in summary.items():
+            logging.info(f"⏱️ {stage}: n={stats['count']} p50={stats['p50']:.2f}s p95={stats['p95']:.2f}s max={stats['max']:.2f}s")
+
+        if prometheus_path:
+            lines = [
+                "# HELP article_pipeline_stage_seconds Duration of each article pipeline stage.",
+                "# TYPE article_pipeline_stage_seconds summary",
+            ]
+            for stage, stats in summary.items():
+                for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("1", "max")):
+                    lines.append(f'article_pipeline_stage_seconds{{stage="{stage}",quantile="{quantile}"}} {stats[key]}')
+                lines.append(f'article_pipeline_stage_seconds_sum{{stage="{stage}"}} {stats["total"]}')
+                lines.append(f'article_pipeline_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+            # Write then rename so the textfile collector never reads a half-written file
+            partial_path = f"{prometheus_path}.tmp"
+            with open(partial_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(partial_path, prometheus_path)
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+timings = StageTimer()
@@ -0,0 +1,75 @@
+"""Durable per-stage job ledger used to resume interrupted runs."""
+import sqlite3
+import threading
+import time
+
+from merge import SECTION_KEYS
+
+STAGE_DONE = "done"
+STAGE_FAILED = "failed"
+
+# Every stage an article goes through; it is finished once all of them are done
+LEDGER_STAGES = ["page_loaded"] + SECTION_KEYS + ["docx", "merged"]
+
+
+class JobLedger:
+    """
+    Durable per-stage progress keyed by JID+AID, kept in SQLite (WAL mode) so a crashed
+    or restarted run only redoes the stages that never finished. Extracted sections are
+    stored with their stage so they can be merged without revisiting the tab.
+    Safe to share between worker threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS stages (
+                    jid TEXT NOT NULL,
+                    aid INTEGER NOT NULL,
+                    stage TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    output TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (jid, aid, stage)
+                )
+            """)
+            self._conn.commit()
+
+    def mark(self, jid: str, aid: int, stage: str, status: str = STAGE_DONE, output: str = None, error: str = None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages (jid, aid, stage, status, output, error, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (jid, aid, stage, status, output, error, time.time()),
+            )
+            self._conn.commit()
+
+    def completed_stages(self, jid: str, aid: int) -> dict:
+        """Stage name -> stored output for every stage of the article that is done."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, output FROM stages WHERE jid = ? AND aid = ? AND status = ?",
+                (jid, aid, STAGE_DONE),
+            ).fetchall()
+        return dict(rows)
+
+    def articles(self, stage: str = None) -> list:
+        """(jid, aid) of every article the ledger has a stage for, or only those with `stage` done."""
+        with self._lock:
+            if stage is None:
+                return self._conn.execute("SELECT DISTINCT jid, aid FROM stages ORDER BY jid, aid").fetchall()
+            return self._conn.execute(
+                "SELECT jid, aid FROM stages WHERE stage = ? AND status = ? ORDER BY jid, aid", (stage, STAGE_DONE)
+            ).fetchall()
+
+    def is_complete(self, jid: str, aid: int) -> bool:
+        return all(stage in self.completed_stages(jid, aid) for stage in LEDGER_STAGES)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,555 @@
+"""Section extraction and report rendering. Needs only BeautifulSoup, never a browser."""
+from bs4 import BeautifulSoup, SoupStrainer
+import os
+import re
+import gzip
+import logging
+import threading
+import hashlib
+import string
+import time
+
+# Prefer lxml for speed; fall back to the stdlib parser when it isn't installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+
+def use_html_parser(name: str):
+    """Switches the BeautifulSoup backend, e.g. from --html-parser or in a parsing process."""
+    global HTML_PARSER
+    HTML_PARSER = name
+
+
+def parse_html(markup: str, parse_only=None) -> BeautifulSoup:
+    """Parses markup with the configured HTML_PARSER backend."""
+    return BeautifulSoup(markup, HTML_PARSER, parse_only=parse_only)
+
+SECTION_KEYS = ["guidelines", "article_info", "author_info", "problem_notes", "comments", "Attachments"]
+
+# Container each section is extracted from, used to strain the parse down to that subtree
+SECTION_CONTAINERS = {
+    "guidelines": ("fieldset", {}),
+    "article_info": ("div", {"id": "ArticleInfo"}),
+    "author_info": ("div", {"id": "ctl00_ArticleAuthors_uc_ArticleAuthorsGrid"}),
+    "problem_notes": ("div", {"id": "ArticleProbNotes"}),
+    "comments": ("div", {"id": "ArticleComments"}),
+    "Attachments": ("div", {"id": "ArticleAttachmentGrid"}),
+}
+
+
+# ------------------ SANITISING ------------------
+# Attributes with no effect on how a report looks
+CRUFT_ATTRS = {"style", "tabindex", "accesskey", "autocomplete"}
+HIDDEN_STYLE_RE = re.compile(r"display\s*:\s*none|visibility\s*:\s*hidden", re.IGNORECASE)
+# Whitespace inside these is content and is kept as is
+PRESERVE_WHITESPACE_RE = re.compile(r"<(textarea|pre)\b.*?</\1>", re.IGNORECASE | re.DOTALL)
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _strip_cruft(container):
+    """
+    Removes what an editor never sees from a Telerik container before it is copied into a
+    report: scripts, hidden inputs (RadGrid client state, view state), elements hidden with
+    inline display:none, event handlers, javascript: links, ASP.NET names and ctl00_ ids,
+    and inline styles. Ids the report stylesheet targets are kept.
+    """
+    for tag in container.find_all(["script", "noscript"]):
+        tag.decompose()
+    for tag in container.find_all("input", type="hidden"):
+        tag.decompose()
+    for tag in container.find_all(style=HIDDEN_STYLE_RE):
+        if not tag.decomposed:
+            tag.decompose()
+    for tag in [container] + container.find_all(True):
+        for attr in list(tag.attrs):
+            value = tag.attrs[attr]
+            if (attr in CRUFT_ATTRS or attr.startswith("on")
+                    or (attr == "id" and value.startswith("ctl00") and value not in REPORT_CSS_IDS)
+                    or (attr == "name" and value.startswith("ctl00$"))
+                    or (attr == "href" and value.strip().lower().startswith("javascript:"))):
+                del tag.attrs[attr]
+
+
+def minify_html(html: str) -> str:
+    """Collapses whitespace runs to one space, except inside <textarea> and <pre>."""
+    parts = []
+    position = 0
+    for match in PRESERVE_WHITESPACE_RE.finditer(html):
+        parts.append(WHITESPACE_RE.sub(" ", html[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(WHITESPACE_RE.sub(" ", html[position:]))
+    return "".join(parts).strip()
+
+
+# ------------------ GUIDELINES ------------------
+def _extract_guidelines(soup, article: dict) -> str:
+    html = ""
+    sections = ["Style"]
+    for section in sections:
+        style_legend = soup.find('legend', string='Style')
+        if style_legend:
+            style_fieldset = style_legend.find_parent('fieldset', class_='FormFieldset')
+            if style_fieldset:
+                _strip_cruft(style_fieldset)
+                for row in style_fieldset.find_all('tr'):
+                    cells = row.find_all('td')
+                    if len(cells) >= 2 and section in cells[0].text.strip():
+                        textarea = cells[1].find('textarea')
+                        if textarea:
+                            content = textarea.text.strip()
+                            num_lines = len(content.split('\n'))
+                            textarea.attrs['rows'] = str(num_lines + 5)
+                            textarea['style'] = (
+                                'overflow: hidden; resize: none; width: 100%; '
+                                'min-height: auto; max-width: 100%; box-sizing: border-box; '
+                                'white-space: pre-wrap; word-wrap: break-word; height: auto;'
+                            )
+                html += f"""
+                <div class="box" style="display: block; width: auto; min-width: 100%; max-width: 100%; white-space: pre-wrap;">
+                     <div class="header">Article Guidelines</div>
+                     {str(style_fieldset)}
+                </div>
+                """
+    return html
+
+
+# ------------------ ARTICLE INFO ------------------
+def _extract_article_info(soup, article: dict) -> str:
+    article_info_div = soup.find("div", id="ArticleInfo")
+    if not article_info_div:
+        return ""
+    _strip_cruft(article_info_div)
+    for select in article_info_div.find_all('select'):
+        select.decompose()
+    for link in article_info_div.find_all('a', string='Open the calendar popup.'):
+        parent_td = link.find_parent('td')
+        if parent_td:
+            date_input = parent_td.find('input', type='text')
+            if date_input:
+                new_input = soup.new_tag('input', type='date')
+                new_input['value'] = date_input.get('value', '')
+                new_input['class'] = 'date-input'
+                parent_td.clear()
+                parent_td.append(new_input)
+    for checkbox in soup.find_all("input", {"type": "checkbox"}):
+        checkbox.attrs["class"] = "readonly"
+    for link in article_info_div.find_all("a"):
+        link.decompose()
+
+    return f"""
+    <div class="articlebox">
+        <div class="header">Article Information_{article['jid']}{article['aid']}</div>
+        <div class="rmpView" id="ArticleInfo">
+            {str(article_info_div)}
+        </div>
+    </div>
+    """
+
+
+# ------------------ AUTHOR INFO ------------------
+def _extract_author_info(soup, article: dict) -> str:
+    author_info_div = soup.find("div", id="ctl00_ArticleAuthors_uc_ArticleAuthorsGrid")
+    if not author_info_div:
+        return ""
+    _strip_cruft(author_info_div)
+    for select in author_info_div.find_all('select'):
+        select.decompose()
+    for link in author_info_div.find_all("a"):
+        span_tag = soup.new_tag("span")
+        span_tag.string = link.text
+        link.replace_with(span_tag)
+    for checkbox in soup.find_all("input", {"type": "checkbox"}):
+        checkbox.attrs["class"] = "readonly"
+    for img in author_info_div.find_all("img"):
+        img.decompose()
+    for input_img in author_info_div.find_all('input', type='image'):
+        span_tag = soup.new_tag("span")
+        span_tag.string = "Submit"
+        input_img.replace_with(span_tag)
+
+    structured_table = f"""
+    <table class="structured-table">
+        <tbody>
+            <tr>
+                <td>{str(author_info_div)}</td>
+            </tr>
+        </tbody>
+    </table>
+    """
+
+    return f"""
+    <div class="box">
+        <div class="header">Author Information</div>
+        <div class="rmpView" id="AuthorInfo">
+            {structured_table}
+        </div>
+    </div>
+    """
+
+
+# ------------------ PROBLEM NOTES ------------------
+def _extract_problem_notes(soup, article: dict) -> str:
+    problem_notes_div = soup.find("div", id="ArticleProbNotes")
+    if not problem_notes_div:
+        return ""
+    _strip_cruft(problem_notes_div)
+    for select in problem_notes_div.find_all('select'):
+        select.decompose()
+    for link in problem_notes_div.find_all("a"):
+        span_tag = soup.new_tag("span")
+        span_tag.string = link.text
+        link.replace_with(span_tag)
+    return f"""
+    <div class="articlebox" id="ProblemNotes">
+        <div class="header">Problem Notes – {article['jid']}{article['aid']}</div>
+        <div class="rmpView">
+            {str(problem_notes_div)}
+        </div>
+    </div>
+    """
+
+
+# ------------------ Comments_tab------------------
+def _extract_comments(soup, article: dict) -> str:
+    comments_tab = soup.find("div", id="ArticleComments")
+    if not comments_tab:
+        return ""
+    _strip_cruft(comments_tab)
+    for select in comments_tab.find_all('select'):
+        select.decompose()
+    for link in comments_tab.find_all('a'):
+        span_tag = soup.new_tag("span")
+        span_tag.string = link.text
+        link.replace_with(span_tag)
+    for checkbox in soup.find_all("input", {"type": "checkbox"}):
+        checkbox.attrs["class"] = "readonly"
+    for img in comments_tab.find_all("img"):
+        img.decompose()
+    for input_img in comments_tab.find_all('input', type='image'):
+        span_tag = soup.new_tag("span")
+        span_tag.string = "Submit"
+        input_img.replace_with(span_tag)
+    return f"""
+    <div class="articlebox" id="CommentsInfo">
+        <div class="header">Comments – {article['jid']}{article['aid']}</div>
+        <div class="rmpView">
+            {str(comments_tab)}
+        </div>
+    </div>
+    """
+
+
+# ------------------ ATTACHMENTS ------------------
+def _extract_attachments(soup, article: dict) -> str:
+    attachments_tab = soup.find("div", id="ArticleAttachmentGrid")
+    if not attachments_tab:
+        return ""
+    _strip_cruft(attachments_tab)
+    for select in attachments_tab.find_all('select'):
+        select.decompose()
+    for link in attachments_tab.find_all('a'):
+        span_tag = soup.new_tag("span")
+        span_tag.string = link.text
+        link.replace_with(span_tag)
+    for checkbox in soup.find_all("input", {"type": "checkbox"}):
+        checkbox.attrs["class"] = "readonly"
+    for img in attachments_tab.find_all("img"):
+        img.decompose()
+    for input_img in attachments_tab.find_all('input', type='image'):
+        span_tag = soup.new_tag("span")
+        span_tag.string = "Submit"
+        input_img.replace_with(span_tag)
+    return f"""
+    <div class="articlebox" id="CommentsInfo">
+        <div class="header">Attachments – {article['jid']}{article['aid']}</div>
+        <div class="rmpView">
+            {str(attachments_tab)}
+        </div>
+    </div>
+    """
+
+
+SECTION_EXTRACTORS = {
+    "guidelines": _extract_guidelines,
+    "article_info": _extract_article_info,
+    "author_info": _extract_author_info,
+    "problem_notes": _extract_problem_notes,
+    "comments": _extract_comments,
+    "Attachments": _extract_attachments,
+}
+
+
+def _section_strainer(sections):
+    """Build a SoupStrainer that keeps only the containers of the requested sections."""
+    containers = [SECTION_CONTAINERS[s] for s in sections]
+    names = {name for name, _ in containers}
+    if len(names) != 1:
+        return None
+    name = names.pop()
+    ids = [attrs["id"] for _, attrs in containers if "id" in attrs]
+    if not ids:
+        return SoupStrainer(name)
+    if len(ids) != len(containers):
+        return None
+    return SoupStrainer(name, attrs={"id": ids if len(ids) > 1 else ids[0]})
+
+
+# Define the simplified_html function
+def simplified_html(html_content: str, filename: str, sections=None, article: dict = None) -> dict:
+    """
+    Extracts the requested section(s) from a page in a single parse.
+
+    `sections` is a section key or a list of keys from SECTION_KEYS; when omitted
+    every section is extracted. Only the containers of the requested sections
+    are parsed and only their extractors run.
+    """
+    if sections is None:
+        sections = SECTION_KEYS
+    elif isinstance(sections, str):
+        sections = [sections]
+    if article is None:
+        article = {"jid": "", "aid": ""}
+
+    try:
+        soup = parse_html(html_content, parse_only=_section_strainer(sections))
+
+        result = {key: "" for key in SECTION_KEYS}
+        for section in sections:
+            result[section] += minify_html(SECTION_EXTRACTORS[section](soup, article))
+
+        if not any(result[section] for section in sections):
+            logging.warning(f"No relevant content found in: {filename}")
+
+        return result  # ✅
+
+    except Exception as e:
+        logging.error(f"Error processing HTML content for {filename}: {str(e)}")
+        return f"<html><body><h3>Error processing HTML: {str(e)}</h3></body></html>"
+
+
+def timed_simplified_html(html_content: str, filename: str, sections=None, article: dict = None):
+    """simplified_html() and the seconds it took, for timing a parse that runs in another process."""
+    start = time.perf_counter()
+    result = simplified_html(html_content, filename, sections, article)
+    return result, time.perf_counter() - start
+
+
+# ------------------ REPORT RENDERING ------------------
+# Written once per downloads folder as a content-hashed report.<hash>.css that every report links
+REPORT_CSS = """
+html , body { margin: 0; padding: 0; width: 100%; height: 100%;  }
+.articlebox { border: 1px solid #ccc; padding: 15px; margin: 10px; background: white; height: 220%; }
+.box {  border: 1px solid #ccc; padding: 15px; margin: 10px; background: white; height: auto; }
+.header { font-size: 40px; font-weight: bold; margin-bottom: 10px; }
+.StandardTable {width: 100%; border-collapse: collapse; background: white; border: 1px solid #ddd;}
+.StandardTable td {padding: 8px; border: 1px solid #ddd; vertical-align: top;}
+textarea, input[type="text"], input[type="date"], select { width: 100%; padding: 5px; box-sizing: border-box; border: 1px solid #ccc; background-color: #fff;}
+#ctl00_ArticleInfo_uc_dtpsubdt_dateInput,
+#ctl00_ArticleInfo_uc_dtpRevisedSubmissionDate_dateInput,
+/* Step 1: Target wrapper spans of the date inputs */
+#ctl00_ArticleInfo_uc_dtpsubdt_dateInput_wrapper,
+#ctl00_ArticleInfo_uc_dtpRevisedSubmissionDate_dateInput_wrapper,
+#ctl00_ArticleInfo_uc_dtpacceptdt_dateInput_wrapper {
+    width: 200px !important;
+    display: block !important;
+}
+
+/* Step 2: Target the actual input fields inside them */
+#ctl00_ArticleInfo_uc_dtpsubdt_dateInput,
+#ctl00_ArticleInfo_uc_dtpRevisedSubmissionDate_dateInput,
+#ctl00_ArticleInfo_uc_dtpacceptdt_dateInput {
+    width: 70% !important;
+    padding: 6px;
+    box-sizing: border-box;
+    font-size: 13px;
+}
+input[readonly], textarea[readonly] {
+background-color: #e9ecef;
+cursor: text;
+}
+input[type="checkbox"]:disabled:checked {accent-color: #1cbc1c; filter: brightness(0);}
+.structured-table {width: 100%; border-collapse: collapse; margin-top: 10px; table-layout:auto; }
+.structured-table th, .structured-table td {padding: 10px; border: 1px solid #ddd; text-align: left; white-space:normal;}
+.structured-table { background-color: #f2f2f2; font-weight: bold;}
+.structured-table th { background-color: #f2f2f2; }
+.structured-table th {background-color: #f2f2f2; font-weight: bold; }
+.structured-table tr:nth-child(even) { background-color: #f9f9f9;}
+.footer-section {margin-top: 20px; padding: 15px; text-align: left; font-size: 18px;}
+.footer-section a { text-decoration: none; font-size: 18px; color: blue;}
+.footer-section .bold-link { font-weight: bold; }
+@media (max-width: 768px) {
+    .header { font-size: 2rem; }
+    .box {padding: 10px; margin: 5px; }
+    textarea, input[type="text"], input[type="date"], select { width: 100%; }
+    .footer-section {font-size: 1rem; padding: 10px; }
+    .footer-section a { font-size: 1rem;}
+}
+@media (max-width: 480px) {
+    .header {font-size: 1.5rem;}
+    .box {padding: 5px; margin: 3px;}
+    .footer-section {font-size: 0.875rem; padding: 5px;}
+    .footer-section a {font-size: 0.875rem;}
+}
+#AuthorInfo, .box, .rmpView{overflow:visible;height:auto;max-height:none;display:block;}
+#AuthorInfo .header {font-size: 48px;} /* Increase header font size */
+#AuthorInfo .structured-table th, 
+#AuthorInfo .structured-table td {font-size: 12px;} /* Increase table font size */
+#AuthorInfo .structured-table{width:100%;max-width:100%;}
+input, textarea { pointer-events: none; background-color: #e9ecef; }
+input[type="checkbox"].readonly { accent-color: #1923e3;}
+/* ---------------- Problem Notes Section ---------------- */
+#ProblemNotes {
+    overflow: visible;
+    height: auto;
+    max-height: none;
+    display: block;
+}
+#ProblemNotes .header {
+    font-size: 28px;
+    font-weight: bold;
+    margin-bottom: 12px;
+    color: #2a2a7f; /* dark blue for distinction */
+}
+#ProblemNotes table {
+    width: 100%;
+    border-collapse: collapse;
+    margin-top: 10px;
+}
+#ProblemNotes th, 
+#ProblemNotes td {
+    border: 1px solid #ccc;
+    padding: 8px;
+    text-align: left;
+    font-size: 13px;
+}
+#ProblemNotes tr:nth-child(even) {
+    background-color: #f9f9f9;
+}
+
+/* ---------------- Comments Section ---------------- */
+#CommentsInfo {
+    overflow: visible;
+    height: auto;
+    max-height: none;
+    display: block;
+}
+#CommentsInfo .header {
+    font-size: 28px;
+    font-weight: bold;
+    margin-bottom: 12px;
+    color: #1a6b1a; /* dark green for distinction */
+}
+#CommentsInfo table {
+    width: 100%;
+    border-collapse: collapse;
+    margin-top: 10px;
+}
+#CommentsInfo th, 
+#CommentsInfo td {
+    border: 1px solid #ccc;
+    padding: 8px;
+    text-align: left;
+    font-size: 13px;
+    vertical-align: top;
+}
+#CommentsInfo tr:nth-child(even) {
+    background-color: #f2f2f2;
+}
+"""
+# Ids the stylesheet styles, which sanitising must keep
+REPORT_CSS_IDS = set(re.findall(r"#([A-Za-z][\w-]*)", REPORT_CSS))
+
+REPORT_CSS_NAME = f"report.{hashlib.sha256(REPORT_CSS.encode('utf-8')).hexdigest()[:12]}.css"
+
+# Order the sections appear in the merged report
+REPORT_SECTIONS = ["article_info", "guidelines", "author_info", "problem_notes", "comments", "Attachments"]
+
+# Compiled once at import; only the substitutions change per article
+REPORT_HEAD = string.Template("""<html>
+<head>
+    <meta charset="UTF-8">
+    <link rel="stylesheet" href="$css_href">
+</head>
+<body>
+""")
+REPORT_FOOTER = string.Template("""
+<div class="footer-section">
+    <p><strong>Journal Style_$jid</strong></p>
+    <p>
+        <a href="https://journals.sagepub.com/author-instructions/$jid">Preparing your manuscript @ journals.sagepub.com/author-instruction/$jid</a>
+    </p>
+</div>
+</body>
+</html>
+""")
+
+# Changes whenever the report markup or stylesheet does, so cached sections can tell which reports are stale
+TEMPLATE_VERSION = hashlib.sha256("\0".join(
+    [REPORT_CSS, REPORT_HEAD.template, REPORT_FOOTER.template] + REPORT_SECTIONS
+).encode("utf-8")).hexdigest()[:12]
+
+
+# Set with use_report_gzip(); merged reports are then written as <id>_merged.html.gz
+REPORT_GZIP = False
+
+
+def use_report_gzip(enabled: bool):
+    """Switches merged reports between plain .html and gzip-compressed .html.gz files."""
+    global REPORT_GZIP
+    REPORT_GZIP = enabled
+
+
+def find_merged_report(download_dir: str, article_id: str) -> str:
+    """Path of the article's merged report, plain or gzipped, or None if it hasn't been written."""
+    base_path = os.path.join(download_dir, article_id, f"{article_id}_merged.html")
+    for path in (base_path, base_path + ".gz"):
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def report_id(article_id: str) -> str:
+    """Normalized article ID used for the merged report's folder and file name."""
+    return article_id.replace("_", "").replace(" ", "").lower()
+
+
+def ensure_report_css(download_dir: str) -> str:
+    """Writes the shared stylesheet into `download_dir` if it isn't there yet and returns its path."""
+    css_path = os.path.join(download_dir, REPORT_CSS_NAME)
+    if not os.path.exists(css_path):
+        os.makedirs(download_dir, exist_ok=True)
+        partial_path = f"{css_path}.{threading.get_ident()}.tmp"
+        with open(partial_path, "w", encoding="utf-8") as f:
+            f.write(REPORT_CSS)
+        os.replace(partial_path, css_path)
+    return css_path
+
+
+def merge_simplified_html(article_id: str, article: dict,full_html_content:dict, download_dir: str):
+    """
+    Merges extracted HTML sections into a final merged HTML file and saves it.
+    The report links the shared stylesheet and is streamed to disk section by section.
+    """
+    extracted = full_html_content
+    plain_path = os.path.join(download_dir, article_id, f"{article_id}_merged.html")
+    output_path, stale_path = (plain_path + ".gz", plain_path) if REPORT_GZIP else (plain_path, plain_path + ".gz")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    css_href = os.path.relpath(ensure_report_css(download_dir), os.path.dirname(output_path)).replace(os.sep, "/")
+
+    opener = gzip.open if REPORT_GZIP else open
+    with opener(output_path, "wt", encoding="utf-8") as f:
+        f.write(REPORT_HEAD.substitute(css_href=css_href))
+        for section in REPORT_SECTIONS:
+            f.write(extracted.get(section, ''))
+        f.write(REPORT_FOOTER.substitute(jid=article['jid']))
+
+    # Don't leave the other format behind from an earlier run
+    if os.path.exists(stale_path):
+        os.remove(stale_path)
+
+    print(f"Merged file saved at: {output_path}")
+    return output_path
@@ -0,0 +1,358 @@
+"""
+Local stand-in for the SAGE SMART portal, for end-to-end load tests of auto.py
+without credentials or traffic to production.
+
+It serves login.aspx with the same ctl00_SmartMasterContent_* ids, default.aspx,
+and MaintainArticle.aspx with a RadTabStrip whose tabs switch through ASP.NET AJAX
+partial postbacks (|updatePanel| delta responses), an attachment grid of
+__doPostBack links, and streamed .docx downloads. Latencies are configurable.
+
+    python mock_portal.py --port 8765 --jid TST --tab-latency 0.5
+    python auto.py --base-url http://127.0.0.1:8765/smart/ --input articles.csv
+
+Attachment names use --jid, so the work list should use the same JID.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http.cookies import SimpleCookie
+from urllib.parse import urlparse, parse_qs
+from email.utils import formatdate
+import argparse
+import html
+import io
+import json
+import logging
+import os
+import random
+import secrets
+import threading
+import time
+import zipfile
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+TAB_STRIP_TARGET = "ctl00$SmartMasterContent$RadTabStrip1"
+UPDATE_PANEL_ID = "ctl00_SmartMasterContent_upArticle"
+TAB_NAMES = ["Article Info", "Attachments", "Guidelines", "Authors (2)", "Problems/Notes", "Comments"]
+AUTH_COOKIE = ".ASPXAUTH"
+
+# Client-side stand-ins for the RadTabStrip and Sys.WebForms.PageRequestManager
+PAGE_SCRIPT = """
+var prm = { _busy: false, get_isInAsyncPostBack: function () { return this._busy; } };
+var Sys = { WebForms: { PageRequestManager: { getInstance: function () { return prm; } } } };
+
+function __doPostBack(target, argument) {
+    var form = document.forms['aspnetForm'];
+    form.__EVENTTARGET.value = target;
+    form.__EVENTARGUMENT.value = argument;
+    if (target !== '%(tab_strip)s') { form.submit(); return; }
+    prm._busy = true;
+    var body = new URLSearchParams(new FormData(form));
+    body.set('ctl00$ScriptManager1', '%(panel_name)s|' + target);
+    fetch(location.href, {
+        method: 'POST', body: body, credentials: 'same-origin',
+        headers: { 'X-MicrosoftAjax': 'Delta=true', 'Content-Type': 'application/x-www-form-urlencoded' }
+    }).then(function (r) { return r.text(); }).then(applyDelta).finally(function () { prm._busy = false; });
+}
+
+function applyDelta(text) {
+    var pos = 0;
+    while (pos < text.length) {
+        var lengthEnd = text.indexOf('|', pos);
+        var length = parseInt(text.substring(pos, lengthEnd), 10);
+        var typeEnd = text.indexOf('|', lengthEnd + 1);
+        var type = text.substring(lengthEnd + 1, typeEnd);
+        var idEnd = text.indexOf('|', typeEnd + 1);
+        var id = text.substring(typeEnd + 1, idEnd);
+        var content = text.substr(idEnd + 1, length);
+        pos = idEnd + 1 + length + 1;
+        if (type === 'updatePanel') { document.getElementById(id).innerHTML = content; }
+        else if (type === 'hiddenField') { document.forms['aspnetForm'][id].value = content; }
+        else if (type === 'pageRedirect') { location.href = decodeURIComponent(content); }
+    }
+}
+""" % {"tab_strip": TAB_STRIP_TARGET, "panel_name": UPDATE_PANEL_ID.replace("_", "$")}
+
+
+class PortalConfig:
+    def __init__(self, jid="TST", page_latency=0.3, tab_latency=0.5, download_latency=0.2, jitter=0.2,
+                 docx_size=200_000, attachments=8, session_ttl=1800, username=None, password=None):
+        self.jid = jid
+        self.page_latency = page_latency
+        self.tab_latency = tab_latency
+        self.download_latency = download_latency
+        self.jitter = jitter
+        self.docx_size = docx_size
+        self.attachments = attachments
+        self.session_ttl = session_ttl
+        self.username = username
+        self.password = password
+        self.sessions = {}  # auth token -> expiry timestamp
+        self.lock = threading.Lock()
+        self.docx_bytes = build_docx(docx_size)
+
+    def delay(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+
+def build_docx(size: int) -> bytes:
+    """A small valid .docx zip, padded with incompressible bytes to roughly `size`."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as docx:
+        docx.writestr("[Content_Types].xml",
+                      '<?xml version="1.0" encoding="UTF-8"?><Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                      '<Default Extension="xml" ContentType="application/xml"/></Types>')
+        docx.writestr("word/document.xml",
+                      '<?xml version="1.0" encoding="UTF-8"?><w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                      '<w:body><w:p><w:r><w:t>Mock unedited manuscript</w:t></w:r></w:p></w:body></w:document>')
+        docx.writestr("word/media/padding.bin", os.urandom(max(size - 1024, 0)))
+    return buffer.getvalue()
+
+
+# ------------------ PAGE CONTENT ------------------
+def attachment_names(config: PortalConfig, aid: int) -> list:
+    names = [f"{config.jid}{aid}_Unedited.docx"]
+    names += [f"{config.jid}{aid}_Figure{n}.tif" for n in range(1, config.attachments)]
+    return names
+
+
+def tab_content(config: PortalConfig, aid: int, index: int) -> str:
+    article_id = f"{config.jid}{aid}"
+    if index == 0:
+        return f"""
+        <div id="ArticleInfo"><table class="StandardTable">
+            <tr><td>Article ID</td><td><input type="text" value="{article_id}" readonly></td></tr>
+            <tr><td>Title</td><td><textarea readonly>Mock article {aid}</textarea></td></tr>
+            <tr><td>Status</td><td><select><option selected>In Production</option></select></td></tr>
+            <tr><td>Submitted</td><td><input type="text" id="ctl00_ArticleInfo_uc_dtpsubdt_dateInput" value="2024-01-15">
+                <a href="#">Open the calendar popup.</a></td></tr>
+            <tr><td>Open access</td><td><input type="checkbox" checked disabled></td></tr>
+        </table></div>"""
+    if index == 1:
+        rows = "".join(
+            f"""<tr><td><a href="javascript:__doPostBack('ctl00$SmartMasterContent$ArticleAttachments$grid$ctl{n:02d}$lnkFile','')">{name}</a></td>
+                <td>{len(config.docx_bytes) if n == 0 else 4096}</td><td>2024-01-15</td>
+                <td><input type="image" src="delete.gif"><img src="icon.gif"></td></tr>"""
+            for n, name in enumerate(attachment_names(config, aid))
+        )
+        return f'<div id="ArticleAttachmentGrid"><table class="rgMasterTable"><tbody>{rows}</tbody></table></div>'
+    if index == 2:
+        return """
+        <fieldset class="FormFieldset"><legend>Style</legend><table>
+            <tr><td>Style</td><td><textarea>Use SAGE Harvard referencing.
+Spell out numbers below ten.
+Use single quotation marks.</textarea></td></tr>
+        </table></fieldset>"""
+    if index == 3:
+        return """
+        <div id="ctl00_ArticleAuthors_uc_ArticleAuthorsGrid"><table class="rgMasterTable">
+            <tr><th>Name</th><th>Email</th><th>Corresponding</th></tr>
+            <tr><td><a href="#">Jane Doe</a></td><td>jane@example.org</td><td><input type="checkbox" checked></td></tr>
+            <tr><td><a href="#">John Roe</a></td><td>john@example.org</td><td><input type="checkbox"></td></tr>
+        </table></div>"""
+    if index == 4:
+        return """
+        <div id="ArticleProbNotes"><table class="rgMasterTable">
+            <tr><th>Date</th><th>Note</th></tr>
+            <tr><td>2024-02-01</td><td>Figure 3 resolution too low.</td></tr>
+        </table></div>"""
+    return """
+    <div id="ArticleComments"><table class="rgMasterTable">
+        <tr><th>Date</th><th>Comment</th></tr>
+        <tr><td>2024-02-02</td><td><a href="#">Editor</a>: please check reference 12.</td></tr>
+    </table></div>"""
+
+
+def tab_panel(config: PortalConfig, aid: int, selected: int) -> str:
+    """The update panel's inner HTML: the tab strip plus the selected tab's page view."""
+    tabs = "".join(
+        f"""<li class="rtsLI"><a class="rtsLink{' rtsSelected' if n == selected else ''}" href="#"
+            onclick="__doPostBack('{TAB_STRIP_TARGET}','{html.escape(json.dumps({'type': 0, 'index': str(n)}))}');return false;">
+            <span class="rtsOut"><span class="rtsIn"><span class="rtsTxt">{name}</span></span></span></a></li>"""
+        for n, name in enumerate(TAB_NAMES)
+    )
+    return f"""
+    <div class="RadTabStrip" id="ctl00_SmartMasterContent_RadTabStrip1"><ul class="rtsUL">{tabs}</ul></div>
+    <div class="RadMultiPage"><div class="rmpView">{tab_content(config, aid, selected)}</div></div>"""
+
+
+def hidden_state(aid: int, selected: int) -> dict:
+    return {
+        "__VIEWSTATE": secrets.token_urlsafe(3000) + f"|{aid}|{selected}",
+        "__EVENTVALIDATION": secrets.token_urlsafe(200),
+    }
+
+
+def article_page(config: PortalConfig, aid: int, selected: int = 0) -> str:
+    hidden = "".join(
+        f'<input type="hidden" name="{name}" id="{name}" value="{html.escape(value)}">'
+        for name, value in hidden_state(aid, selected).items()
+    )
+    return f"""<html><head><title>Maintain Article</title><script>{PAGE_SCRIPT}</script></head><body>
+    <form name="aspnetForm" method="post" action="./MaintainArticle.aspx?articleid={aid}" id="aspnetForm">
+    <input type="hidden" name="__EVENTTARGET" id="__EVENTTARGET" value="">
+    <input type="hidden" name="__EVENTARGUMENT" id="__EVENTARGUMENT" value="">
+    {hidden}
+    <div id="{UPDATE_PANEL_ID}">{tab_panel(config, aid, selected)}</div>
+    </form></body></html>"""
+
+
+def delta_response(entries: list) -> str:
+    """Encodes (type, id, content) entries in the ASP.NET AJAX length|type|id|content| format."""
+    return "".join(f"{len(content)}|{entry_type}|{entry_id}|{content}|" for entry_type, entry_id, content in entries)
+
+
+LOGIN_PAGE = """<html><head><title>SMART Login</title></head><body>
+<form name="aspnetForm" method="post" action="./login.aspx" id="aspnetForm">
+    <input type="text" name="ctl00$SmartMasterContent$rtbuserlogin" id="ctl00_SmartMasterContent_rtbuserlogin">
+    <input type="password" name="ctl00$SmartMasterContent$rtbpasswd" id="ctl00_SmartMasterContent_rtbpasswd">
+    <input type="submit" name="ctl00$SmartMasterContent$rblogin_input" id="ctl00_SmartMasterContent_rblogin_input" value="Sign in">
+</form></body></html>"""
+
+
+# ------------------ REQUEST HANDLING ------------------
+class PortalHandler(BaseHTTPRequestHandler):
+    config: PortalConfig = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logging.info("%s - %s", self.address_string(), format % args)
+
+    # -------- helpers --------
+    def _authenticated(self) -> bool:
+        cookies = SimpleCookie(self.headers.get("Cookie", ""))
+        token = cookies[AUTH_COOKIE].value if AUTH_COOKIE in cookies else None
+        with self.config.lock:
+            expiry = self.config.sessions.get(token)
+        return expiry is not None and expiry > time.time()
+
+    def _send(self, status: int, body: str, content_type="text/html; charset=utf-8", headers=None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _redirect(self, location: str, headers=None):
+        headers = dict(headers or {})
+        headers["Location"] = location
+        self._send(302, "", headers=headers)
+
+    def _form(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True).items()}
+
+    def _article_id(self, url) -> int:
+        try:
+            return int(parse_qs(url.query).get("articleid", ["0"])[0])
+        except ValueError:
+            return 0
+
+    # -------- routes --------
+    def do_GET(self):
+        url = urlparse(self.path)
+        page = url.path.rsplit("/", 1)[-1].lower()
+        if page == "login.aspx":
+            return self._send(200, LOGIN_PAGE)
+        if page in ("default.aspx", "maintainarticle.aspx") and not self._authenticated():
+            return self._redirect(f"login.aspx?ReturnUrl={url.path}")
+        if page == "default.aspx":
+            return self._send(200, "<html><body><h1>SMART</h1></body></html>")
+        if page == "maintainarticle.aspx":
+            self.config.delay(self.config.page_latency)
+            return self._send(200, article_page(self.config, self._article_id(url)))
+        self._send(404, "<html><body>Not found</body></html>")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        page = url.path.rsplit("/", 1)[-1].lower()
+        form = self._form()
+        if page == "login.aspx":
+            return self._login(form)
+        if not self._authenticated():
+            if self.headers.get("X-MicrosoftAjax"):
+                return self._send(200, delta_response([("pageRedirect", "", "login.aspx")]), "text/plain; charset=utf-8")
+            return self._redirect("login.aspx")
+        if page != "maintainarticle.aspx":
+            return self._send(404, "<html><body>Not found</body></html>")
+
+        aid = self._article_id(url)
+        target = form.get("__EVENTTARGET", "")
+        if target == TAB_STRIP_TARGET:
+            self.config.delay(self.config.tab_latency)
+            selected = int(json.loads(form.get("__EVENTARGUMENT") or '{"index": "0"}').get("index", 0))
+            entries = [("updatePanel", UPDATE_PANEL_ID, tab_panel(self.config, aid, selected))]
+            entries += [("hiddenField", name, value) for name, value in hidden_state(aid, selected).items()]
+            return self._send(200, delta_response(entries), "text/plain; charset=utf-8")
+        if target.endswith("$lnkFile"):
+            return self._download(aid, target)
+        self._send(200, article_page(self.config, aid))
+
+    def _login(self, form: dict):
+        username = form.get("ctl00$SmartMasterContent$rtbuserlogin", "")
+        password = form.get("ctl00$SmartMasterContent$rtbpasswd", "")
+        if (self.config.username and username != self.config.username) or \
+                (self.config.password and password != self.config.password):
+            return self._send(200, LOGIN_PAGE)
+        token = secrets.token_hex(16)
+        expiry = time.time() + self.config.session_ttl
+        with self.config.lock:
+            self.config.sessions[token] = expiry
+        cookie = f"{AUTH_COOKIE}={token}; Path=/; Expires={formatdate(expiry, usegmt=True)}; HttpOnly"
+        self._redirect("default.aspx", headers={"Set-Cookie": cookie})
+
+    def _download(self, aid: int, target: str):
+        names = attachment_names(self.config, aid)
+        try:
+            index = int(target.split("$ctl")[-1].split("$")[0])
+            name = names[index]
+        except (ValueError, IndexError):
+            return self._send(404, "<html><body>Unknown attachment</body></html>")
+        data = self.config.docx_bytes if index == 0 else os.urandom(4096)
+        self.config.delay(self.config.download_latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        self.send_header("Content-Disposition", f'attachment; filename="{name}"')
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        for start in range(0, len(data), 64 * 1024):
+            self.wfile.write(data[start:start + 64 * 1024])
+
+
+def serve(host: str, port: int, config: PortalConfig):
+    PortalHandler.config = config
+    server = ThreadingHTTPServer((host, port), PortalHandler)
+    print(f"🧪 Mock SMART portal at http://{host}:{port}/smart/ (JID {config.jid})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the SAGE SMART portal")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--jid", default="TST", help="journal id used in attachment file names")
+    parser.add_argument("--page-latency", type=float, default=0.3, help="seconds before MaintainArticle.aspx responds")
+    parser.add_argument("--tab-latency", type=float, default=0.5, help="seconds before a tab's partial postback responds")
+    parser.add_argument("--download-latency", type=float, default=0.2, help="seconds before a download starts streaming")
+    parser.add_argument("--jitter", type=float, default=0.2, help="random +/- fraction applied to every latency")
+    parser.add_argument("--docx-size", type=int, default=200_000, help="approximate size of the unedited .docx in bytes")
+    parser.add_argument("--attachments", type=int, default=8, help="rows in each article's attachment grid")
+    parser.add_argument("--session-ttl", type=float, default=1800, help="seconds a login session stays valid")
+    parser.add_argument("--username", default=None, help="only accept this login id (default: any)")
+    parser.add_argument("--password", default=None, help="only accept this password (default: any)")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, PortalConfig(
+        jid=args.jid, page_latency=args.page_latency, tab_latency=args.tab_latency,
+        download_latency=args.download_latency, jitter=args.jitter, docx_size=args.docx_size,
+        attachments=args.attachments, session_ttl=args.session_ttl,
+        username=args.username, password=args.password,
+    ))
@@ -0,0 +1,47 @@
+"""Overlaps HTML extraction with browser work: pages are parsed in a process pool while the driver moves on."""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import merge
+from merge import timed_simplified_html
+
+
+class ExtractionPipeline:
+    """
+    Parses captured page_source strings in a process pool and runs each article's finishing
+    step (waiting for its parses, ledger, merge, cache) on a background thread, so the thread
+    driving Chrome goes straight on to the next tab or article. At most `max_pending`
+    articles wait to be finished; beyond that the driver thread blocks, which bounds memory.
+    """
+
+    def __init__(self, processes: int = None, max_pending: int = None):
+        # spawn rather than fork: the parent already runs Selenium and session threads
+        self._pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=merge.use_html_parser, initargs=(merge.HTML_PARSER,))
+        self._finisher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="finish")
+        self._pending = threading.BoundedSemaphore(max_pending or 2 * (processes or multiprocessing.cpu_count()))
+
+    def extract(self, page_html: str, filename: str, section: str, article: dict):
+        """Queues one section's extraction; the future resolves to (simplified_html result, seconds)."""
+        return self._pool.submit(timed_simplified_html, page_html, filename, section, article)
+
+    def finish(self, finish_fn, article_id: str):
+        """Runs `finish_fn` on the finishing thread once a slot is free."""
+        self._pending.acquire()
+
+        def run():
+            try:
+                finish_fn()
+            except Exception as e:
+                logging.error(f"Failed to finish article {article_id}: {e}")
+            finally:
+                self._pending.release()
+
+        return self._finisher.submit(run)
+
+    def close(self):
+        """Waits for every queued article to be finished, then stops the pool."""
+        self._finisher.shutdown(wait=True)
+        self._pool.shutdown(wait=True)
@@ -0,0 +1,135 @@
+"""
+Waits, retries and pauses for everything that talks to the portal. Timeouts are learned from
+the latencies seen so far in the run, retries back off exponentially with jitter, and a circuit
+breaker pauses every worker once several articles in a row have failed.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from instrumentation import percentile
+
+# Latencies kept per operation; recent ones are what the next timeout should follow
+LATENCY_WINDOW = 50
+# Observations needed before an operation's timeout is learned instead of its ceiling
+MIN_SAMPLES = int(os.getenv("ADAPTIVE_MIN_SAMPLES", 5))
+# Learned timeout = p95 latency x this factor, but never under TIMEOUT_FLOOR nor over the ceiling
+TIMEOUT_FACTOR = float(os.getenv("ADAPTIVE_TIMEOUT_FACTOR", 3))
+TIMEOUT_FLOOR = float(os.getenv("ADAPTIVE_TIMEOUT_FLOOR", 2))
+
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+BREAKER_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_THRESHOLD", 5))
+BREAKER_COOLDOWN = float(os.getenv("CIRCUIT_BREAKER_COOLDOWN", 60))
+BREAKER_MAX_COOLDOWN = 15 * 60
+
+
+class PortalScheduler:
+    """
+    Shared by every worker thread. timeout() hands out per-operation waits learned from
+    observe(); backoff() spaces out retries; before_article()/after_article() run the
+    circuit breaker: closed, open (everyone waits out the cooldown), then half-open (one trial
+    article decides whether to close again or reopen with a doubled cooldown).
+    """
+
+    def __init__(self):
+        self.adaptive = True
+        self.breaker_threshold = BREAKER_THRESHOLD
+        self.breaker_cooldown = BREAKER_COOLDOWN
+        self._latencies = {}  # operation -> recent latencies in seconds
+        self._lock = threading.Lock()
+        self._breaker = threading.Condition()
+        self._consecutive_failures = 0
+        self._state = "closed"
+        self._open_until = 0.0
+        self._cooldown = None
+        self._trial_running = False
+
+    # -------- adaptive timeouts --------
+    def observe(self, operation: str, seconds: float):
+        """Records how long `operation` took. Timed-out waits should be observed at their timeout."""
+        with self._lock:
+            self._latencies.setdefault(operation, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def timeout(self, operation: str, ceiling: float) -> float:
+        """The wait for `operation`: learned from its recent latencies once there are enough, else `ceiling`."""
+        if not self.adaptive:
+            return ceiling
+        with self._lock:
+            latencies = list(self._latencies.get(operation, ()))
+        if len(latencies) < MIN_SAMPLES:
+            return ceiling
+        return min(ceiling, max(TIMEOUT_FLOOR, percentile(latencies, 95) * TIMEOUT_FACTOR))
+
+    # -------- retries --------
+    def backoff(self, attempt: int) -> float:
+        """Seconds to wait before retry `attempt` (1-based): exponential, capped, with equal jitter."""
+        delay = min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def sleep_before_retry(self, attempt: int):
+        time.sleep(self.backoff(attempt))
+
+    # -------- circuit breaker --------
+    def before_article(self) -> bool:
+        """
+        Blocks while the breaker is open, and while another worker's half-open trial is running.
+        True when the caller's article is that trial; pass it back to after_article().
+        """
+        if self.breaker_threshold <= 0:
+            return False
+        with self._breaker:
+            while True:
+                if self._state == "open":
+                    remaining = self._open_until - time.time()
+                    if remaining > 0:
+                        self._breaker.wait(remaining)
+                        continue
+                    self._state = "half-open"
+                    logging.warning("🔌 Circuit breaker half-open: trying one article")
+                if self._state == "half-open":
+                    if self._trial_running:
+                        self._breaker.wait()
+                        continue
+                    self._trial_running = True
+                    return True
+                return False
+
+    def after_article(self, ok, trial: bool = False):
+        """
+        Counts the article's outcome; trips the breaker after `breaker_threshold` failures in a row.
+        `ok` None says nothing about the portal: it only frees the trial slot for another article.
+        """
+        if self.breaker_threshold <= 0:
+            return
+        with self._breaker:
+            if trial:
+                self._trial_running = False
+            if ok is None:
+                pass
+            elif ok:
+                if self._state != "closed":
+                    logging.warning("🔌 Circuit breaker closed: the portal is answering again")
+                self._state, self._consecutive_failures, self._cooldown = "closed", 0, None
+            else:
+                self._consecutive_failures += 1
+                if trial or (self._state == "closed" and self._consecutive_failures >= self.breaker_threshold):
+                    self._cooldown = min(self._cooldown * 2, BREAKER_MAX_COOLDOWN) if self._cooldown else self.breaker_cooldown
+                    self._state, self._open_until = "open", time.time() + self._cooldown
+                    logging.error(f"🔌 Circuit breaker open after {self._consecutive_failures} failed articles in a row; "
+                                  f"pausing the run for {self._cooldown:.0f}s")
+            self._breaker.notify_all()
+
+    def summary(self) -> dict:
+        """Operation -> the timeout it has learned, for the end-of-run log."""
+        with self._lock:
+            operations = list(self._latencies)
+        learned = {operation: self.timeout(operation, float("inf")) for operation in operations}
+        return {operation: seconds for operation, seconds in learned.items() if seconds != float("inf")}
+
+
+scheduler = PortalScheduler()
@@ -0,0 +1,144 @@
+"""Compressed per-article cache of extracted sections, and the incremental re-render built on it."""
+import sqlite3
+import threading
+import time
+import json
+import zlib
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import merge
+from merge import SECTION_KEYS, TEMPLATE_VERSION, report_id, ensure_report_css, merge_simplified_html
+
+
+def sections_hash(sections: dict) -> str:
+    """Content hash of an article's extracted sections."""
+    canonical = json.dumps({key: sections.get(key) or '' for key in SECTION_KEYS}, sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def section_fingerprint(html: str) -> str:
+    """Hash of a section's HTML with whitespace normalised, to tell whether it changed between runs."""
+    return hashlib.sha256(" ".join(html.split()).encode("utf-8")).hexdigest()
+
+
+class SectionCache:
+    """
+    Extracted sections of every article, stored as one zlib-compressed JSON blob per JID+AID
+    in SQLite (WAL mode) with its content hash. Also remembers which content hash and
+    TEMPLATE_VERSION each merged report was last rendered from, so only stale reports
+    are rebuilt. Safe to share between worker threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS sections (
+                    jid TEXT NOT NULL,
+                    aid INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    rendered_hash TEXT,
+                    template_version TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (jid, aid)
+                )
+            """)
+            self._conn.commit()
+
+    def put(self, jid: str, aid: int, sections: dict) -> str:
+        """Stores the article's sections and returns their content hash. Unchanged content is not rewritten."""
+        content_hash = sections_hash(sections)
+        data = zlib.compress(json.dumps({key: sections.get(key) or '' for key in SECTION_KEYS}).encode("utf-8"))
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO sections (jid, aid, content_hash, data, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (jid, aid) DO UPDATE SET content_hash = excluded.content_hash, data = excluded.data,
+                    updated_at = excluded.updated_at
+                WHERE sections.content_hash != excluded.content_hash
+            """, (jid, aid, content_hash, data, time.time()))
+            self._conn.commit()
+        return content_hash
+
+    def get(self, jid: str, aid: int) -> dict:
+        """The article's cached sections, or None when it isn't cached."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM sections WHERE jid = ? AND aid = ?", (jid, aid)).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def mark_rendered(self, jid: str, aid: int, content_hash: str, template_version: str = TEMPLATE_VERSION):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sections SET rendered_hash = ?, template_version = ? WHERE jid = ? AND aid = ?",
+                (content_hash, template_version, jid, aid),
+            )
+            self._conn.commit()
+
+    def stale(self, template_version: str = TEMPLATE_VERSION, force: bool = False) -> list:
+        """(jid, aid) of every article whose report predates its sections or the current template."""
+        query = "SELECT jid, aid FROM sections"
+        params = ()
+        if not force:
+            query += " WHERE rendered_hash IS NULL OR rendered_hash != content_hash OR template_version IS NOT ?"
+            params = (template_version,)
+        with self._lock:
+            return self._conn.execute(query + " ORDER BY jid, aid", params).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Each re-render process opens the cache once and reads the sections itself
+_worker_cache = None
+
+
+def _init_render_worker(cache_path: str, report_gzip: bool):
+    global _worker_cache
+    _worker_cache = SectionCache(cache_path)
+    merge.use_report_gzip(report_gzip)
+
+
+def _render_cached(jid: str, aid: int, download_dir: str):
+    """Rebuilds one merged report from the cache; returns the content hash it was rendered from."""
+    sections = _worker_cache.get(jid, aid)
+    if sections is None:
+        return None
+    merge_simplified_html(report_id(f"{jid}{aid}"), {"jid": jid, "aid": aid}, sections, download_dir)
+    return sections_hash(sections)
+
+
+def rerender_reports(cache_path: str, download_dir: str, processes: int = None, force: bool = False) -> int:
+    """
+    Rebuilds, across a process pool, the merged reports whose cached sections or template
+    version changed since they were last rendered (every report with `force`). Returns the
+    number of reports written.
+    """
+    cache = SectionCache(cache_path)
+    try:
+        stale = cache.stale(force=force)
+        if not stale:
+            return 0
+        # Written once up front so the processes never race to create it
+        ensure_report_css(download_dir)
+        rendered = 0
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_render_worker, initargs=(cache_path, merge.REPORT_GZIP)) as pool:
+            futures = {pool.submit(_render_cached, jid, aid, download_dir): (jid, aid) for jid, aid in stale}
+            for future, (jid, aid) in futures.items():
+                try:
+                    content_hash = future.result()
+                except Exception as e:
+                    logging.error(f"Failed to re-render article {jid}{aid}: {e}")
+                    continue
+                if content_hash is not None:
+                    cache.mark_rendered(jid, aid, content_hash)
+                    rendered += 1
+        return rendered
+    finally:
+        cache.close()
@@ -0,0 +1,109 @@
+import email
+import email.policy
+import socketserver
+import threading
+
+import pytest
+
+from email_sender import SendLedger, SmtpConnection, dispatch_reports
+
+
+class SmtpStub(socketserver.ThreadingTCPServer):
+    """Just enough SMTP for smtplib: counts connections and keeps every message it accepts."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SmtpStubHandler)
+        self.connections = 0
+        self.messages = []
+
+
+class SmtpStubHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 stub")
+        while True:
+            line = self.rfile.readline().decode("ascii").strip()
+            command = line[:4].upper()
+            if not line or command == "QUIT":
+                self.reply("221 bye")
+                return
+            if command == "DATA":
+                self.reply("354 go on")
+                data = []
+                while (line := self.rfile.readline()) not in (b".\r\n", b""):
+                    data.append(line[1:] if line.startswith(b"..") else line)
+                self.server.messages.append(email.message_from_bytes(b"".join(data), policy=email.policy.default))
+            self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp_server():
+    server = SmtpStub()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def send_ledger(tmp_path):
+    ledger = SendLedger(str(tmp_path / "sent.sqlite3"))
+    yield ledger
+    ledger.close()
+
+
+def write_report(download_dir, jid: str, aid: int, body: str = "report"):
+    report_dir = download_dir / f"{jid}{aid}".lower()
+    report_dir.mkdir(exist_ok=True)
+    (report_dir / f"{jid}{aid}_merged.html".lower()).write_text(f"<html><body>{body}</body></html>", encoding="utf-8")
+    docx_dir = download_dir / f"{jid}{aid}"
+    docx_dir.mkdir(exist_ok=True)
+    (docx_dir / f"{jid}{aid}_Unedited.docx").write_bytes(b"PK docx")
+
+
+def dispatch(smtp_server, articles, download_dir, send_ledger, **kwargs):
+    smtp = SmtpConnection("127.0.0.1", smtp_server.server_address[1], user=None, security="none")
+    return dispatch_reports(articles, str(download_dir), send_ledger, {"*": ["editor@example.org"]},
+                            smtp=smtp, **kwargs)
+
+
+def test_batches_share_one_connection_and_are_never_resent(tmp_path, smtp_server, send_ledger):
+    articles = [("TST", aid) for aid in range(1, 6)]
+    for jid, aid in articles:
+        write_report(tmp_path, jid, aid)
+
+    assert dispatch(smtp_server, articles, tmp_path, send_ledger, batch_size=2) == 3
+    assert smtp_server.connections == 1
+    attachments = [[part.get_filename() for part in message.iter_attachments()] for message in smtp_server.messages]
+    assert attachments[0] == ["TST1_merged.html", "TST1_Unedited.docx", "TST2_merged.html", "TST2_Unedited.docx"]
+    assert [len(names) for names in attachments] == [4, 4, 2]
+
+    # Every report is in the send ledger now: nothing is mailed, no connection is opened
+    assert dispatch(smtp_server, articles, tmp_path, send_ledger, batch_size=2) == 0
+    assert smtp_server.connections == 1
+    assert len(smtp_server.messages) == 3
+
+
+def test_changed_report_is_sent_again(tmp_path, smtp_server, send_ledger):
+    articles = [("TST", 1), ("TST", 2)]
+    for jid, aid in articles:
+        write_report(tmp_path, jid, aid)
+    assert dispatch(smtp_server, articles, tmp_path, send_ledger) == 1
+
+    write_report(tmp_path, "TST", 2, body="re-rendered")
+    assert dispatch(smtp_server, articles, tmp_path, send_ledger) == 1
+    assert "TST2" in smtp_server.messages[-1].get_body(("plain",)).get_content()
+    assert "TST1" not in smtp_server.messages[-1].get_body(("plain",)).get_content()
+
+
+def test_dry_run_sends_and_records_nothing(tmp_path, smtp_server, send_ledger):
+    write_report(tmp_path, "TST", 1)
+    assert dispatch(smtp_server, [("TST", 1)], tmp_path, send_ledger, dry_run=True) == 0
+    assert smtp_server.messages == []
+    assert dispatch(smtp_server, [("TST", 1)], tmp_path, send_ledger) == 1
@@ -0,0 +1,63 @@
+"""A full `fetch --engine http` run against mock_portal.py: no browser, no real portal."""
+import os
+import subprocess
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from ledger import JobLedger
+from merge import find_merged_report, report_id
+from mock_portal import PortalConfig, PortalHandler
+
+AUTO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "auto.py")
+ARTICLES = [1, 2, 3]
+
+
+@pytest.fixture
+def portal_url():
+    PortalHandler.config = PortalConfig(jid="TST", page_latency=0, tab_latency=0, download_latency=0, jitter=0,
+                                        docx_size=20_000, attachments=4)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PortalHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/smart/"
+    server.shutdown()
+    server.server_close()
+
+
+def run_fetch(workdir, portal_url, parse_processes):
+    env = dict(os.environ, login_id="tester", login_pwd="secret", PYTHONIOENCODING="utf-8")
+    return subprocess.run(
+        [sys.executable, AUTO, "fetch", "--engine", "http", "--base-url", portal_url,
+         "--download-dir", "out", "--parse-processes", parse_processes],
+        cwd=workdir, env=env, capture_output=True, text=True, encoding="utf-8", timeout=120,
+    )
+
+
+# "0" parses inline; "2" hands pages to the extraction pipeline, which the run must drain before closing the ledger
+@pytest.mark.parametrize("parse_processes", ["0", "2"])
+def test_http_engine_fetches_and_resumes(tmp_path, portal_url, parse_processes):
+    (tmp_path / "articles.csv").write_text("JID,AID\n" + "".join(f"TST,{aid}\n" for aid in ARTICLES), encoding="utf-8")
+
+    result = run_fetch(tmp_path, portal_url, parse_processes)
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "Failed to finish article" not in result.stdout + result.stderr
+
+    download_dir = tmp_path / "out"
+    ledger = JobLedger(str(download_dir / "jobs.sqlite3"))
+    try:
+        for aid in ARTICLES:
+            article_id = f"TST{aid}"
+            assert ledger.is_complete("TST", aid)
+            assert find_merged_report(str(download_dir), report_id(article_id))
+            assert any(name.endswith(".docx") for name in os.listdir(download_dir / article_id))
+    finally:
+        ledger.close()
+
+    # A second run finds every article finished in the ledger and skips it
+    result = run_fetch(tmp_path, portal_url, parse_processes)
+    assert result.returncode == 0, result.stdout + result.stderr
+    for aid in ARTICLES:
+        assert f"Skipping already processed article: TST{aid}" in result.stdout
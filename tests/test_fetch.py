@@ -0,0 +1,45 @@
+from fetch import order_by_jid, read_article_rows, validate_articles
+
+
+def test_validate_articles_normalises_rows():
+    rows = [(2, {"JID": " TST ", "AID": "12"}), (3, {"jid": "abc", "aid": "7"})]
+    assert list(validate_articles(rows)) == [{"jid": "TST", "aid": 12}, {"jid": "abc", "aid": 7}]
+
+
+def test_validate_articles_skips_malformed_rows():
+    rows = [
+        (2, ["TST", "1"]),
+        (3, {"JID": "", "AID": "1"}),
+        (4, {"JID": "TS T", "AID": "1"}),
+        (5, {"JID": "TST", "AID": "1a"}),
+        (6, {"JID": "TST", "AID": None}),
+        (7, {"JID": "TST", "AID": "5"}),
+    ]
+    assert list(validate_articles(rows)) == [{"jid": "TST", "aid": 5}]
+
+
+def test_validate_articles_skips_non_ascii_digits_and_keeps_going():
+    rows = [(2, {"JID": "TST", "AID": "²"}), (3, {"JID": "TST", "AID": "①"}), (4, {"JID": "TST", "AID": "١٢"}),
+            (5, {"JID": "TST", "AID": "3"})]
+    assert list(validate_articles(rows)) == [{"jid": "TST", "aid": 3}]
+
+
+def test_validate_articles_skips_duplicates_regardless_of_case():
+    rows = [(2, {"JID": "TST", "AID": "1"}), (3, {"JID": "tst", "AID": "01"}), (4, {"JID": "TST", "AID": "2"})]
+    assert list(validate_articles(rows)) == [{"jid": "TST", "aid": 1}, {"jid": "TST", "aid": 2}]
+
+
+def test_read_article_rows_csv_and_jsonl(tmp_path):
+    csv_path = tmp_path / "articles.csv"
+    csv_path.write_text("JID,AID\nTST,1\nTST,2\n", encoding="utf-8")
+    jsonl_path = tmp_path / "articles.jsonl"
+    jsonl_path.write_text('{"jid": "TST", "aid": 1}\nnot json\n\n{"jid": "TST", "aid": 2}\n', encoding="utf-8")
+
+    assert [row for _, row in read_article_rows(str(csv_path))] == [{"JID": "TST", "AID": "1"}, {"JID": "TST", "AID": "2"}]
+    assert list(validate_articles(read_article_rows(str(jsonl_path)))) == [{"jid": "TST", "aid": 1}, {"jid": "TST", "aid": 2}]
+
+
+def test_order_by_jid_puts_priority_jids_first_within_chunks():
+    articles = [{"jid": jid, "aid": aid} for aid, jid in enumerate(["B", "A", "C", "A", "B", "C"])]
+    ordered = [article["jid"] for article in order_by_jid(articles, 3, ["C"])]
+    assert ordered == ["C", "A", "B", "C", "A", "B"]
@@ -0,0 +1,37 @@
+import pytest
+
+from http_scraper import match_tab, parse_delta
+from mock_portal import delta_response
+
+
+def test_parse_delta_splits_entries():
+    entries = [("updatePanel", "ctl00_panel", "<div>Authors</div>"), ("hiddenField", "__VIEWSTATE", "abc=")]
+    assert parse_delta(delta_response(entries)) == entries
+
+
+def test_parse_delta_keeps_separators_inside_content():
+    entries = [("updatePanel", "panel", "a|b||c"), ("pageRedirect", "", "%2fsmart%2flogin.aspx")]
+    assert parse_delta(delta_response(entries)) == entries
+
+
+def test_parse_delta_empty_response():
+    assert parse_delta("") == []
+
+
+@pytest.mark.parametrize("text", [
+    "<html><body>Login</body></html>",
+    "5|updatePanel|panel|abc|",
+    "3|updatePanel|panel|abcdef|",
+    "12|updatePanel",
+])
+def test_parse_delta_rejects_non_delta(text):
+    with pytest.raises(ValueError):
+        parse_delta(text)
+
+
+def test_match_tab_prefers_prefix_then_substring():
+    labels = ["Article", "Problems/Notes (2)", "Attachments", "Notes"]
+    assert match_tab(labels, "Notes") == 3
+    assert match_tab(labels, "Problems/Notes") == 1
+    assert match_tab(labels, "Attach") == 2
+    assert match_tab(labels, "Comments") == -1
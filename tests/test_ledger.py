@@ -0,0 +1,58 @@
+import pytest
+
+from fetch import pending_articles
+from ledger import LEDGER_STAGES, STAGE_FAILED, JobLedger
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = JobLedger(str(tmp_path / "jobs.sqlite3"))
+    yield ledger
+    ledger.close()
+
+
+def finish(ledger, jid, aid, stages=LEDGER_STAGES):
+    for stage in stages:
+        ledger.mark(jid, aid, stage, output=f"<{stage}>")
+
+
+def test_completed_stages_keeps_outputs_of_done_stages_only(ledger):
+    ledger.mark("TST", 1, "article_info", output="<info>")
+    ledger.mark("TST", 1, "docx", STAGE_FAILED, error="unedited .docx not downloaded")
+    assert ledger.completed_stages("TST", 1) == {"article_info": "<info>"}
+    assert not ledger.is_complete("TST", 1)
+
+
+def test_failed_stage_is_retried_then_done(ledger):
+    finish(ledger, "TST", 1, [stage for stage in LEDGER_STAGES if stage != "docx"])
+    ledger.mark("TST", 1, "docx", STAGE_FAILED, error="timeout")
+    assert not ledger.is_complete("TST", 1)
+    ledger.mark("TST", 1, "docx", output="signature")
+    assert ledger.is_complete("TST", 1)
+
+
+def test_pending_articles_skips_finished_articles(ledger):
+    finish(ledger, "TST", 1)
+    finish(ledger, "TST", 2, LEDGER_STAGES[:3])
+    articles = [{"jid": "TST", "aid": aid} for aid in (1, 2, 3)]
+
+    assert [article["aid"] for article in pending_articles(articles, ledger)] == [2, 3]
+    assert [article["aid"] for article in pending_articles(articles, ledger, refresh=True)] == [1, 2, 3]
+    assert [article["aid"] for article in pending_articles(articles)] == [1, 2, 3]
+
+
+def test_ledger_survives_reopening(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first = JobLedger(path)
+    finish(first, "TST", 1)
+    first.mark("TST", 2, "page_loaded")
+    first.close()
+
+    resumed = JobLedger(path)
+    try:
+        assert resumed.is_complete("TST", 1)
+        assert resumed.completed_stages("TST", 2) == {"page_loaded": None}
+        assert resumed.articles() == [("TST", 1), ("TST", 2)]
+        assert resumed.articles("merged") == [("TST", 1)]
+    finally:
+        resumed.close()
@@ -0,0 +1,40 @@
+from merge import _strip_cruft, minify_html, parse_html
+
+
+def strip(markup: str) -> str:
+    container = parse_html(markup).find("div")
+    _strip_cruft(container)
+    return str(container)
+
+
+def test_strip_cruft_removes_scripts_hidden_state_and_hidden_elements():
+    html = strip('<div><script>var x = 1;</script><noscript>js off</noscript>'
+                 '<input type="hidden" name="ctl00$grid_ClientState" value="{}">'
+                 '<span style="display: none">hidden</span><span style="visibility:hidden">also</span>'
+                 '<span>shown</span></div>')
+    assert html == "<div><span>shown</span></div>"
+
+
+def test_strip_cruft_removes_handlers_names_ids_and_styles():
+    html = strip('<div id="ctl00_panel" style="color: red" onclick="go()">'
+                 '<a href="javascript:__doPostBack(\'x\',\'\')" onmouseover="hl()" tabindex="1">File.docx</a>'
+                 '<a href="https://example.org/guide">Guide</a>'
+                 '<input type="text" name="ctl00$title" id="ctl00_title" value="A title" autocomplete="off"></div>')
+    assert html == ('<div><a>File.docx</a><a href="https://example.org/guide">Guide</a>'
+                    '<input type="text" value="A title"/></div>')
+
+
+def test_strip_cruft_keeps_ids_the_stylesheet_targets():
+    html = strip('<div><span id="ctl00_ArticleInfo_uc_dtpsubdt_dateInput_wrapper">2024-01-01</span>'
+                 '<span id="AuthorInfo">Authors</span></div>')
+    assert 'id="ctl00_ArticleInfo_uc_dtpsubdt_dateInput_wrapper"' in html
+    assert 'id="AuthorInfo"' in html
+
+
+def test_minify_html_collapses_whitespace():
+    assert minify_html("\n  <div>\n\t<span>a</span>   <span>b</span>\n</div>\n") == "<div> <span>a</span> <span>b</span> </div>"
+
+
+def test_minify_html_keeps_whitespace_in_textarea_and_pre():
+    html = "<div>  <textarea>line 1\n  line 2</textarea>  <PRE>a\n\n b</PRE>  </div>"
+    assert minify_html(html) == "<div> <textarea>line 1\n  line 2</textarea> <PRE>a\n\n b</PRE> </div>"
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+import scheduler as scheduler_module
+from scheduler import PortalScheduler
+
+
+@pytest.fixture
+def portal():
+    portal = PortalScheduler()
+    portal.breaker_threshold = 3
+    portal.breaker_cooldown = 0.1
+    return portal
+
+
+def test_timeout_is_the_ceiling_until_enough_samples(portal):
+    for _ in range(scheduler_module.MIN_SAMPLES - 1):
+        portal.observe("tab:Authors", 1.0)
+    assert portal.timeout("tab:Authors", 90) == 90
+    portal.observe("tab:Authors", 1.0)
+    assert portal.timeout("tab:Authors", 90) == pytest.approx(1.0 * scheduler_module.TIMEOUT_FACTOR)
+
+
+def test_timeout_stays_between_floor_and_ceiling(portal):
+    for _ in range(scheduler_module.MIN_SAMPLES):
+        portal.observe("fast", 0.01)
+        portal.observe("slow", 50)
+    assert portal.timeout("fast", 90) == scheduler_module.TIMEOUT_FLOOR
+    assert portal.timeout("slow", 90) == 90
+
+
+def test_fixed_timeouts_ignore_observations(portal):
+    portal.adaptive = False
+    for _ in range(scheduler_module.MIN_SAMPLES):
+        portal.observe("http", 0.5)
+    assert portal.timeout("http", 60) == 60
+    assert portal.summary() == {}
+
+
+def test_summary_lists_learned_timeouts_only(portal):
+    for _ in range(scheduler_module.MIN_SAMPLES):
+        portal.observe("http", 1.0)
+    portal.observe("docx_download", 1.0)
+    assert portal.summary() == {"http": pytest.approx(1.0 * scheduler_module.TIMEOUT_FACTOR)}
+
+
+def test_backoff_grows_with_jitter_and_is_capped(portal):
+    for attempt in range(1, 10):
+        delay = min(scheduler_module.BACKOFF_CAP, scheduler_module.BACKOFF_BASE * 2 ** (attempt - 1))
+        assert delay / 2 <= portal.backoff(attempt) <= delay
+
+
+def test_breaker_opens_after_consecutive_failures(portal):
+    portal.after_article(False)
+    portal.after_article(False)
+    portal.after_article(True)
+    portal.after_article(False)
+    portal.after_article(False)
+    assert portal._state == "closed"
+    portal.after_article(False)
+    assert portal._state == "open"
+
+
+def test_unknown_outcome_does_not_count(portal):
+    for _ in range(2):
+        portal.after_article(False)
+    portal.after_article(None)
+    assert portal._state == "closed"
+    portal.after_article(False)
+    assert portal._state == "open"
+
+
+def test_open_breaker_holds_articles_then_lets_one_trial_through(portal):
+    for _ in range(3):
+        portal.after_article(False)
+    start = time.time()
+    assert portal.before_article() is True
+    assert time.time() - start >= 0.05
+    assert portal._state == "half-open"
+
+    # Other workers wait for the trial to finish
+    released = []
+    waiter = threading.Thread(target=lambda: released.append(portal.before_article()))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+
+    portal.after_article(True, trial=True)
+    waiter.join(1)
+    assert released == [False]
+    assert portal._state == "closed"
+
+
+def test_failed_trial_reopens_with_doubled_cooldown(portal):
+    for _ in range(3):
+        portal.after_article(False)
+    trial = portal.before_article()
+    portal.after_article(False, trial)
+    assert portal._state == "open"
+    assert portal._cooldown == pytest.approx(0.2)
+
+
+def test_unknown_trial_outcome_frees_the_trial_slot(portal):
+    for _ in range(3):
+        portal.after_article(False)
+    trial = portal.before_article()
+    portal.after_article(None, trial)
+    assert portal._state == "half-open"
+    assert portal.before_article() is True
+
+
+def test_breaker_disabled(portal):
+    portal.breaker_threshold = 0
+    for _ in range(10):
+        portal.after_article(False)
+    assert portal.before_article() is False